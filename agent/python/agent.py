@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import collections
+import concurrent.futures
 import getopt
 import socket
 import os
 import sys
 import psutil
+import threading
 import time
 import uuid
 import argparse
@@ -19,51 +22,241 @@ from coapthon import defines
 import messages_pb2
 
 client = None
+push_client = None
 agent_id = str(uuid.getnode())
 agent_name = socket.gethostname()
 ping_rate = 1000 #ping every 1000ms
 
 tasks = {}
+tasks_lock = threading.Lock()
+
+# when set the agent observes push/<agent_id> on the master so tasks
+# arrive as soon as they are submitted instead of on the next pong.
+# observed_master_id is the master_id of the master we observe.
+observe_tasks = False
+observed_master_id = None
+
+# images are pulled by at most max_image_pulls threads and evicted least
+# recently used first beyond image_cache_bytes (0 for no limit).
+# prefetch_images are pulled at startup.
+max_image_pulls = 2
+image_cache_bytes = 0
+prefetch_images = []
+
+# containers are started by at most max_launches threads so the ping
+# loop never waits on docker. Tasks are reported STARTING until their
+# container exists.
+max_launches = 4
+launch_pool = None
+
+# delta pings only carry the tasks that changed since the last ping the
+# master acknowledged. task_changed_seq maps a task_id to the seq of the
+# first ping that carried its current state.
+delta_pings = True
+ping_seq = 0
+acked_seq = 0
+full_sync = True
+full_sync_seq = 0
+task_changed_seq = {}
+
+# task_ids whose logs the master asked for in the last pong
+logs_requested = set()
+
+class ResourceSampler(threading.Thread):
+    # Samples CPU and memory in the background and keeps a rolling
+    # snapshot, so building a ping never blocks on psutil.
+    def __init__(self, interval=1, window=5):
+        super(ResourceSampler, self).__init__(name="sampler", daemon=True)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.cpu_samples = collections.deque(maxlen=window)
+        self.mem_available = psutil.virtual_memory().available
+        # prime psutil so the non-blocking fallback has a baseline
+        psutil.cpu_percent(interval=None, percpu=True)
+
+    def run(self):
+        while True:
+            cpu_list = psutil.cpu_percent(interval=self.interval, percpu=True)
+            cpu_value = 0
+            for cpu in cpu_list:
+                cpu_value += (100 - cpu)/100
+            mem_available = psutil.virtual_memory().available
+            with self.lock:
+                self.cpu_samples.append(cpu_value)
+                self.mem_available = mem_available
+
+    def snapshot(self):
+        with self.lock:
+            if self.cpu_samples:
+                return sum(self.cpu_samples) / len(self.cpu_samples), self.mem_available
+        # no full sample yet, use the usage since the last call
+        cpu_value = 0
+        for cpu in psutil.cpu_percent(interval=None, percpu=True):
+            cpu_value += (100 - cpu)/100
+        return cpu_value, psutil.virtual_memory().available
+
+sampler = ResourceSampler()
+
+cpu_capacity = psutil.cpu_count()
+mem_capacity = psutil.virtual_memory().total
 
 def constructPing(wrapper):
+    global ping_seq
+    ping_seq += 1
+
     wrapper.ping.agent.ping_rate = ping_rate
     wrapper.ping.agent.id = agent_id
     wrapper.ping.agent.name = agent_name
 
-    # add CPU
+    # add CPU and MEMORY. The master reserves what tasks ask for out of
+    # these, so they are the agent's capacity rather than what is free
     cpu_resource = wrapper.ping.agent.resources.add()
     cpu_resource.name = "cpus"
     cpu_resource.type = messages_pb2.Value.SCALAR
-    cpu_list = psutil.cpu_percent(interval=1,percpu=True)
-    cpu_value = 0
-    for cpu in cpu_list:
-        cpu_value += (100 - cpu)/100
-    cpu_resource.scalar.value = cpu_value
-    print("CPU Available:")
+    cpu_resource.scalar.value = cpu_capacity
+    print("CPU Capacity:")
     print(cpu_resource)
 
-    # add MEMORY
     mem_resource = wrapper.ping.agent.resources.add()
     mem_resource.name = "mem"
     mem_resource.type = messages_pb2.Value.SCALAR
-    mem_resource.scalar.value = psutil.virtual_memory().available
-    print("Memory Available:")
+    mem_resource.scalar.value = mem_capacity
+    print("Memory Capacity:")
     print(mem_resource)
 
+    # what is actually free is only informational
+    cpu_value, mem_value = sampler.snapshot()
+    for name, value in (("cpus_free", cpu_value), ("mem_free", mem_value)):
+        attribute = wrapper.ping.agent.attributes.add()
+        attribute.name = name
+        attribute.type = messages_pb2.Value.SCALAR
+        attribute.scalar.value = value
+
     # iterate through the containers and update the state
+    with tasks_lock:
+        addTaskStates(wrapper)
+    print(wrapper.ping.tasks)
+
+def addTaskStates(wrapper):
+    global full_sync_seq
+    if tasks:
+        dockerhelper.refreshIfNoEvents()
     for task_id, task in tasks.items():
         if task.container.type == messages_pb2.ContainerInfo.Type.DOCKER:
+            if task_id not in dockerhelper.containers:
+                #still launching, or the launch failed
+                continue
+            old_state = (task.state, task.log_digest)
             task.state = dockerhelper.getContainerStatus(task_id)
-            if task.state == messages_pb2.TaskInfo.ERRORED:
-                task.error_message = dockerhelper.getContainerLogs(task_id)
+            if task.state in dockerhelper.TERMINAL_STATES and not task.log_digest:
+                #captured in the background once the container exited
+                summary = dockerhelper.getLogSummary(task_id)
+                if summary is not None:
+                    task.log_digest, task.log_size = summary
+            if (task.state, task.log_digest) != old_state:
+                task_changed_seq[task_id] = ping_seq
+
+    # send the logs the master asked for, once, and an empty one (no
+    # digest) for those we no longer have so the master stops waiting
+    for task_id in logs_requested:
+        log = dockerhelper.getLogs(task_id)
+        if log is not None:
+            wrapper.ping.logs.add(task_id=task_id, digest=log[0], data=log[1])
+        else:
+            wrapper.ping.logs.add(task_id=task_id)
+    logs_requested.clear()
 
     # add the state of tasks to the ping
-    wrapper.ping.tasks.extend(tasks.values())
-    print(wrapper.ping.tasks)
+    if not delta_pings:
+        wrapper.ping.tasks.extend(tasks.values())
+    else:
+        wrapper.ping.seq = ping_seq
+        wrapper.ping.ack_seq = acked_seq
+        if full_sync:
+            if not full_sync_seq:
+                full_sync_seq = ping_seq
+            wrapper.ping.full_sync = True
+            wrapper.ping.tasks.extend(tasks.values())
+        else:
+            for task_id, task in tasks.items():
+                if task_changed_seq.get(task_id, ping_seq) > acked_seq:
+                    wrapper.ping.tasks.append(task)
+
+def handlePong(pong):
+    global acked_seq, full_sync, full_sync_seq
+    if pong.ack_seq > acked_seq:
+        acked_seq = pong.ack_seq
+    if pong.resync:
+        print("Master requested a full resync")
+        full_sync = True
+        full_sync_seq = 0
+    elif full_sync and full_sync_seq and acked_seq >= full_sync_seq:
+        full_sync = False
+        full_sync_seq = 0
+    logs_requested.update(pong.fetch_logs)
+
+def launchTask(run_task):
+    if run_task.task.container.type == messages_pb2.ContainerInfo.Type.DOCKER:
+        print("Received Docker Task!!")
+
+        with tasks_lock:
+            if run_task.task.task_id in tasks:
+                print("Task already launched")
+                return
+
+            print("Storing task")
+            run_task.task.state = messages_pb2.TaskInfo.STARTING
+            tasks[run_task.task.task_id] = run_task.task
+            task_changed_seq[run_task.task.task_id] = ping_seq + 1
+
+        #start pulling now even if every launch thread is busy
+        if dockerhelper.images is not None:
+            dockerhelper.images.prefetch(run_task.task.container.docker.image)
+        print("Launching task")
+        launch_pool.submit(runTask, run_task)
+    else:
+        print("Agent cannot run this type of task")
 
+def runTask(run_task):
+    # runs on the launch pool. Let ping check the state once the
+    # container exists
+    task_id = run_task.task.task_id
+    error = None
+    try:
+        if dockerhelper.runImageFromRunTask(run_task) is None:
+            error = "image " + run_task.task.container.docker.image + " could not be pulled"
+    except Exception as e:
+        error = str(e)
+    if error is not None:
+        print("Task " + task_id + " failed to launch: " + error)
+        with tasks_lock:
+            task = tasks[task_id]
+            task.state = messages_pb2.TaskInfo.ERRORED
+            task.error_message = error
+            task_changed_seq[task_id] = ping_seq + 1
+
+def handlePush(response):
+    # called by the observing client for every notification
+    if response is None or not response.payload:
+        return
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.ParseFromString(response.payload)
+    if wrapper.pong.run_tasks:
+        print("Pushed " + str(len(wrapper.pong.run_tasks)) + " task(s)!")
+    for run_task in wrapper.pong.run_tasks:
+        launchTask(run_task)
+
+def observeTasks(host, port):
+    # observations share nothing with the ping client, whose response
+    # queue would otherwise receive our notifications
+    global push_client
+    if push_client is not None:
+        push_client.stop()
+    push_client = HelperClient(server=(host, int(port)))
+    push_client.observe('push/' + agent_id, handlePush)
 
 def main(host, port):  # pragma: no cover
-    global client
+    global client, launch_pool, observed_master_id
 
     try:
         tmp = socket.gethostbyname(host)
@@ -73,6 +266,19 @@ def main(host, port):  # pragma: no cover
     
     client = HelperClient(server=(host, int(port)))
     
+    # keep resource usage sampled off the ping loop
+    if not sampler.is_alive():
+        sampler.start()
+
+    # pull images and start containers off the ping loop
+    if launch_pool is None:
+        launch_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_launches, thread_name_prefix="launch")
+    if dockerhelper.images is None:
+        dockerhelper.startImageCache(max_image_pulls, image_cache_bytes, prefetch_images)
+    # follow container state from docker's events instead of polling
+    dockerhelper.agentID = agent_id
+    if dockerhelper.watcher is None:
+        dockerhelper.startEventWatcher()
 
     # construct message
     wrapper = messages_pb2.WrapperMessage()
@@ -85,8 +291,17 @@ def main(host, port):  # pragma: no cover
 
     # loop ping/pong
     try:
+        # schedule pings against a fixed clock so the period doesn't drift
+        # by however long building and sending the ping took
+        next_ping = time.monotonic()
         while True:
-            time.sleep(ping_rate / 1000)
+            next_ping += ping_rate / 1000
+            delay = next_ping - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # we fell behind; don't burst pings to catch up
+                next_ping = time.monotonic()
             wrapper = messages_pb2.WrapperMessage()
             constructPing(wrapper)
             print("")
@@ -97,23 +312,25 @@ def main(host, port):  # pragma: no cover
                 print("Pong!")
                 wrapper = messages_pb2.WrapperMessage()
                 wrapper.ParseFromString(response.payload)
+                handlePong(wrapper.pong)
+                # (re)observe once the master knows us, after it lost our
+                # state, or when a new master (restarted or a standby that
+                # took over) answers, which has no record of our observation
+                new_master = wrapper.pong.master_id != observed_master_id
+                if observe_tasks and (push_client is None or wrapper.pong.resync or new_master):
+                    observed_master_id = wrapper.pong.master_id
+                    observeTasks(host, port)
                 if wrapper.pong.run_task.task.name:
-                    if wrapper.pong.run_task.task.container.type == messages_pb2.ContainerInfo.Type.DOCKER:
-                        print("Received Docker Task!!")
-
-                        print("Storing task")
-                        tasks[wrapper.pong.run_task.task.task_id] = wrapper.pong.run_task.task
-
-                        print("Launching task")
-                        #for now just grab the container info. Let ping check the state on the next run
-                        containerInfo = dockerhelper.runImageFromRunTask(wrapper.pong.run_task)
-                    else:
-                        print("Agent cannot run this type of task")
+                    launchTask(wrapper.pong.run_task)
+                for run_task in wrapper.pong.run_tasks:
+                    launchTask(run_task)
 
     except KeyboardInterrupt:
         print("Client Shutdown")
         # TODO: Deregister
         client.stop()
+        if push_client is not None:
+            push_client.stop()
 
 
 
@@ -121,6 +338,22 @@ if __name__ == '__main__':  # pragma: no cover
     parser = argparse.ArgumentParser(description='Launch the CoAP Resource Manager Agent')
     parser.add_argument('--host', required=True, help='the Master IP to register with.')
     parser.add_argument('--port', required=False, default=5683, help='the Master port to register on.')
+    parser.add_argument('--full-pings', action='store_true', help='send every task in every ping instead of only changed tasks.')
+    parser.add_argument('--observe', action='store_true', help='observe the master for tasks so they arrive without waiting for a ping.')
+    parser.add_argument('--ping-rate', required=False, type=int, default=ping_rate, help='the ping period in milliseconds.')
+    parser.add_argument('--log-bytes', required=False, type=int, default=dockerhelper.log_bytes, help='how much of the end of an exited container\'s log to keep.')
+    parser.add_argument('--max-launches', required=False, type=int, default=max_launches, help='how many containers may be starting at once.')
+    parser.add_argument('--max-image-pulls', required=False, type=int, default=max_image_pulls, help='how many images may be pulled at once.')
+    parser.add_argument('--image-cache-bytes', required=False, type=int, default=image_cache_bytes, help='evict least recently used images beyond this many bytes (0 for no limit).')
+    parser.add_argument('--prefetch-image', action='append', default=[], help='an image to pull at startup (may be repeated).')
     args = parser.parse_args()
+    delta_pings = not args.full_pings
+    dockerhelper.log_bytes = args.log_bytes
+    max_launches = args.max_launches
+    max_image_pulls = args.max_image_pulls
+    image_cache_bytes = args.image_cache_bytes
+    prefetch_images = args.prefetch_image
+    observe_tasks = args.observe
+    ping_rate = args.ping_rate
     main(args.host, args.port)
     main()
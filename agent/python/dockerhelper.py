@@ -1,3 +1,8 @@
+import collections
+import concurrent.futures
+import hashlib
+import re
+import threading
 import docker
 import time
 import messages_pb2
@@ -5,6 +10,14 @@ client = docker.from_env()
 
 containers = {}
 
+# every container we launch is labelled with its task, framework and
+# agent ids, so ours can be listed and their events filtered by label
+LABEL_PREFIX = "edge-rm."
+agentID = None
+
+def agentLabel():
+    return LABEL_PREFIX + "agent_id=" + str(agentID)
+
 def hello():
     print("hello")
 
@@ -14,7 +27,7 @@ def fetchImage(imageURL, forcepull=False):
 
     image = None
     try:
-        image = docker.get(imageURL)
+        image = client.images.get(imageURL)
         imageReady = True
     except docker.errors.ImageNotFound:
         # need to pull image
@@ -28,8 +41,11 @@ def fetchImage(imageURL, forcepull=False):
         pullImage = True
 
     if pullImage == True or imageReady == False:
-        image = docker.pull(imageURL)
-    
+        try:
+            image = client.images.pull(imageURL)
+        except docker.errors.APIError:
+            image = None
+
     if image == None:
         ## Maybe the image doesn't exist? Maybe docker.pull will throw and APIError?
         print("Image not found. Returning without executing task!")
@@ -38,16 +54,175 @@ def fetchImage(imageURL, forcepull=False):
 
     return image
 
-def runImage(image, cpu_shares, mem_limit, network, ports, frameworkName, taskID):
-    containerName = str(frameworkName + '-' + taskID).replace(" ","-")
-    container = client.containers.run(image, cpu_quota=int(cpu_shares), cpu_period=100000, mem_limit=int(mem_limit), network_mode=network, ports=ports, detach=True, name=containerName)
-    containers[taskID] = container
+def normalizeImage(imageURL):
+    # "name" and "name:latest" are the same image
+    if '@' in imageURL or ':' in imageURL.split('/')[-1]:
+        return imageURL
+    return imageURL + ':latest'
 
-def getContainerStatus(taskID):
-    container = containers[taskID]
+class ImageCache:
+    # Pulls images on a small pool of threads so a launch never pulls
+    # inline, and a launch that needs an image already being pulled waits
+    # on that pull instead of starting another. Images are evicted least
+    # recently used first once they take more than disk_budget bytes (0
+    # for no limit). Every image on the host counts towards the budget,
+    # but only images the cache pulled itself are ever evicted, so other
+    # services' images are left alone (as are images pulled before the
+    # agent restarted). Sizes are docker's per image sizes, so layers
+    # shared between images are counted more than once.
+    def __init__(self, max_pulls=2, disk_budget=0):
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_pulls, thread_name_prefix="pull")
+        self.disk_budget = disk_budget
+        self.lock = threading.Lock()
+        self.evict_lock = threading.Lock()
+        #pulls maps an image name to the Future of its pull. images maps
+        #an image id to its image, least recently used first, and names
+        #maps an image name to its image id. pulled holds the ids of the
+        #images the cache pulled
+        self.pulls = {}
+        self.images = collections.OrderedDict()
+        self.names = {}
+        self.pulled = set()
+        for image in client.images.list():
+            self._add(image)
+
+    def _add(self, image):
+        self.images[image.id] = image
+        self.images.move_to_end(image.id)
+        for tag in image.tags:
+            self.names[tag] = image.id
+
+    def prefetch(self, imageURL):
+        # the Future of the image, pulling it in the background unless it
+        # is cached or already being pulled
+        name = normalizeImage(imageURL)
+        with self.lock:
+            future = self.pulls.get(name)
+            if future is not None and (not future.done() or self.names.get(name) in self.images):
+                return future
+            image = self.images.get(self.names.get(name))
+            if image is not None:
+                future = concurrent.futures.Future()
+                future.set_result(image)
+            else:
+                future = self.pool.submit(self._pull, name)
+            self.pulls[name] = future
+            return future
+
+    def get(self, imageURL, timeout=None):
+        # the image, waiting for it to be pulled if need be. None if it
+        # couldn't be pulled
+        name = normalizeImage(imageURL)
+        image = self.prefetch(name).result(timeout)
+        with self.lock:
+            if image is not None and image.id in self.images:
+                self.images.move_to_end(image.id)
+        return image
+
+    def _pull(self, name):
+        print("Pulling image " + name)
+        start = time.time()
+        pulled = False
+        try:
+            image = client.images.get(name)
+        except docker.errors.ImageNotFound:
+            image = fetchImage(name)
+            pulled = image is not None
+        except docker.errors.APIError:
+            image = None
+        with self.lock:
+            if image is None:
+                #let the next launch try again
+                del self.pulls[name]
+                return None
+            self._add(image)
+            self.names[name] = image.id
+            if pulled:
+                self.pulled.add(image.id)
+        print("Image " + name + " ready after " + str(round(time.time() - start, 1)) + "s")
+        self.evict(image.id)
+        return image
+
+    def evict(self, keep=None):
+        # keep is an image a launch is about to use
+        if not self.disk_budget:
+            return
+        with self.evict_lock:
+            #images of containers we launched are never evicted; docker
+            #would refuse to remove them anyway
+            with states_lock:
+                in_use = set([container.attrs.get('Image') for container in containers.values()])
+            in_use.add(keep)
+            with self.lock:
+                used = sum([image.attrs.get('Size', 0) for image in self.images.values()])
+                victims = []
+                for image_id, image in self.images.items():
+                    if used <= self.disk_budget:
+                        break
+                    if image_id in self.pulled and image_id not in in_use:
+                        victims.append(image_id)
+                        used -= image.attrs.get('Size', 0)
+            for image_id in victims:
+                try:
+                    client.images.remove(image_id)
+                except docker.errors.APIError as e:
+                    print("Could not evict image " + image_id + ": " + str(e))
+                    continue
+                with self.lock:
+                    self.images.pop(image_id, None)
+                    self.pulled.discard(image_id)
+                    for name, named_id in list(self.names.items()):
+                        if named_id == image_id:
+                            del self.names[name]
+                            self.pulls.pop(name, None)
+                print("Evicted image " + image_id)
+
+images = None
+
+def startImageCache(max_pulls=2, disk_budget=0, prefetch=()):
+    global images
+    images = ImageCache(max_pulls, disk_budget)
+    for imageURL in prefetch:
+        images.prefetch(imageURL)
+
+def runImage(image, cpu_shares, mem_limit, network, ports, frameworkName, taskID, frameworkID=""):
+    containerName = str(frameworkName + '-' + taskID).replace(" ","-")
+    labels = {
+        LABEL_PREFIX + "task_id": taskID,
+        LABEL_PREFIX + "framework_id": frameworkID,
+        LABEL_PREFIX + "agent_id": str(agentID),
+    }
+    container = client.containers.run(image, cpu_quota=int(cpu_shares), cpu_period=100000, mem_limit=int(mem_limit), network_mode=network, ports=ports, detach=True, name=containerName, labels=labels)
+    with states_lock:
+        containers[taskID] = container
+        containerTasks[container.id] = taskID
+    #events from before the container was tracked were dropped, so start
+    #from its state now
     container.reload()
-    status = container.status
-    print(status)
+    setState(taskID, stateFromStatus(container.status, container.attrs.get('State', {}).get('ExitCode')))
+    return container
+
+# Container states are kept up to date from docker's event stream, so
+# reporting them costs no docker calls however many tasks the agent has
+# run. While the stream is down they are refreshed by listing all of our
+# containers in one call instead. states maps a taskID to its TaskInfo
+# state and containerTasks a container id to its taskID.
+
+TERMINAL_STATES = (messages_pb2.TaskInfo.COMPLETED, messages_pb2.TaskInfo.KILLED, messages_pb2.TaskInfo.ERRORED)
+
+states = {}
+containerTasks = {}
+states_lock = threading.Lock()
+
+def stateFromExit(exitCode):
+    if exitCode == 0:
+        return messages_pb2.TaskInfo.COMPLETED
+    elif exitCode == 137:
+        return messages_pb2.TaskInfo.KILLED
+    else:
+        return messages_pb2.TaskInfo.ERRORED
+
+def stateFromStatus(status, exitCode):
     if status == 'running':
         #This is good
         return messages_pb2.TaskInfo.RUNNING
@@ -55,23 +230,143 @@ def getContainerStatus(taskID):
         #This is okay
         return messages_pb2.TaskInfo.STARTING
     elif status == 'exited' or status == 'dead' or status == 'removing':
-        #Okay we need to get the status code to see what happened
-        #this should exit immediately
-        info = container.wait(timeout=1)
-        if info['StatusCode'] == 0:
-            return messages_pb2.TaskInfo.COMPLETED
-        elif info['StatusCode'] == 137:
-            return messages_pb2.TaskInfo.KILLED
-        else:
-            return messages_pb2.TaskInfo.ERRORED
-
-def getContainerLogs(taskID):
-    container = containers[taskID]
-    return container.logs(tail=100)
+        return stateFromExit(exitCode)
+    return None
+
+def setState(taskID, state):
+    # a container that exited stays exited, whatever stale events say
+    if state is None:
+        return
+    with states_lock:
+        if states.get(taskID) in TERMINAL_STATES:
+            return
+        states[taskID] = state
+    if state in TERMINAL_STATES:
+        log_pool.submit(captureLogs, taskID)
+
+def getContainerStatus(taskID):
+    with states_lock:
+        return states.get(taskID, messages_pb2.TaskInfo.STARTING)
+
+def refreshStates():
+    # one listing of our containers instead of a reload() per container.
+    # Sparse listings carry the exit code only in the status text.
+    with states_lock:
+        tracked = set(containers)
+    try:
+        listed = client.containers.list(all=True, sparse=True, filters={'label': agentLabel()})
+    except docker.errors.APIError as e:
+        print("Could not list containers: " + str(e))
+        return
+    seen = set()
+    for container in listed:
+        taskID = container.attrs.get('Labels', {}).get(LABEL_PREFIX + "task_id")
+        if taskID not in tracked:
+            continue
+        seen.add(taskID)
+        exitCode = re.match(r'Exited \((\d+)\)', container.attrs.get('Status', ''))
+        setState(taskID, stateFromStatus(container.status, int(exitCode.group(1)) if exitCode else None))
+    for taskID in tracked - seen:
+        #removed behind our back
+        setState(taskID, messages_pb2.TaskInfo.KILLED)
+
+class EventWatcher(threading.Thread):
+    # Follows docker's events for our containers. If the stream breaks
+    # (say docker restarted) states are refreshed by listing until it
+    # reconnects from the last event it saw, and once more then in case
+    # events were missed.
+    def __init__(self):
+        super(EventWatcher, self).__init__(name="events", daemon=True)
+        self.since = None
+        self.connected = False
+
+    def run(self):
+        while True:
+            try:
+                events = client.events(decode=True, since=self.since,
+                                       filters={'type': 'container', 'label': agentLabel()})
+                self.connected = True
+                refreshStates()
+                for event in events:
+                    self.handle(event)
+            except Exception as e:
+                print("Docker event stream failed: " + str(e))
+            self.connected = False
+            time.sleep(1)
+
+    def handle(self, event):
+        self.since = event.get('time', self.since)
+        with states_lock:
+            taskID = containerTasks.get(event.get('id'))
+        if taskID is None:
+            #not one of ours
+            return
+        action = event.get('Action') or event.get('status')
+        if action == 'start' or action == 'restart' or action == 'unpause':
+            setState(taskID, messages_pb2.TaskInfo.RUNNING)
+        elif action == 'die':
+            exitCode = event.get('Actor', {}).get('Attributes', {}).get('exitCode')
+            setState(taskID, stateFromExit(int(exitCode) if exitCode is not None else None))
+
+watcher = None
+
+def startEventWatcher():
+    global watcher
+    watcher = EventWatcher()
+    watcher.start()
+
+def refreshIfNoEvents():
+    # called once per ping so states keep moving while there is no stream
+    if watcher is None or not watcher.connected:
+        refreshStates()
+
+# A container's log is captured once, when it exits, on a thread of its
+# own so pings never wait on docker. Only its last log_tail_lines lines
+# are read, and of those the last log_bytes bytes kept. Pings only carry
+# the log's digest and size; the log is sent when the master asks for
+# it. logs maps a taskID to its (digest, log) for the last max_logs tasks.
+log_bytes = 16384
+log_tail_lines = 1000
+max_logs = 64
+logs = collections.OrderedDict()
+logs_lock = threading.Lock()
+log_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="logs")
+
+def captureLogs(taskID):
+    data = bytearray()
+    try:
+        with states_lock:
+            container = containers[taskID]
+        for chunk in container.logs(stream=True, follow=False, tail=log_tail_lines):
+            data += chunk
+            if len(data) > log_bytes:
+                del data[:len(data) - log_bytes]
+    except Exception as e:
+        print("Could not capture the logs of task " + taskID + ": " + str(e))
+    data = bytes(data)
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    with logs_lock:
+        logs[taskID] = (digest, data)
+        while len(logs) > max_logs:
+            logs.popitem(last=False)
+
+def getLogSummary(taskID):
+    # (digest, size) of the captured log, or None until it is captured
+    with logs_lock:
+        log = logs.get(taskID)
+    if log is None:
+        return None
+    return log[0], len(log[1])
+
+def getLogs(taskID):
+    # (digest, log) if it is still cached, otherwise None
+    with logs_lock:
+        return logs.get(taskID)
 
 def runImageFromRunTask(run_task):
     imageName = run_task.task.container.docker.image
     frameworkName = run_task.task.framework.name
+    frameworkID = run_task.task.framework.framework_id
     taskID = run_task.task.task_id
     cpu_shares = None
     mem_limit = None
@@ -93,4 +388,10 @@ def runImageFromRunTask(run_task):
         if limit.name == "mem":
             mem_limit = limit.scalar.value
     print(imageName, network_setting, ports)
-    runImage(imageName, cpu_shares, mem_limit, network_setting, ports,frameworkName,taskID)
+    if images is not None:
+        #waits on the image's pull, if it is being pulled
+        image = images.get(imageName)
+        if image is None:
+            print("Image not found. Returning without executing task!")
+            return None
+    return runImage(imageName, cpu_shares, mem_limit, network_setting, ports,frameworkName,taskID,frameworkID)
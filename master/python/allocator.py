@@ -0,0 +1,122 @@
+import threading
+
+import messages_pb2
+
+import db
+import resource_matrix
+
+# Allocation ledger. Every task that hasn't finished holds a reservation
+# of its scalar resources on its agent, and offers only include what an
+# agent reports (its capacity, not what happens to be idle) minus what is
+# reserved there. The ledger follows the task
+# table through db.change_listeners, so it is rebuilt by restores too.
+# Outstanding offers (see offers.py) hold the resources they carry in the
+# same way until they are accepted, rescinded or expire.
+
+RELEASED_STATES = db.TERMINAL_STATES + (messages_pb2.TaskInfo.TaskState.LOST,)
+
+#reservations maps a task_id and offerHolds an offer_id to
+#(agent_id, framework_id, {resource name: amount}). reserved sums them
+#up per agent_id and frameworkReserved per framework_id; holders and
+#frameworkHolders count the reservations behind each sum.
+reservations = {}
+offerHolds = {}
+reserved = {}
+holders = {}
+frameworkReserved = {}
+frameworkHolders = {}
+lock = threading.Lock()
+
+def scalars(message):
+    amounts = {}
+    for resource in message.resources:
+        if resource.type == messages_pb2.Value.SCALAR:
+            amounts[resource.name] = amounts.get(resource.name, 0) + resource.scalar.value
+    return amounts
+
+def _credit(sums, counts, key, amounts):
+    counts[key] = counts.get(key, 0) + 1
+    key_sums = sums.setdefault(key, {})
+    for name, amount in amounts.items():
+        key_sums[name] = key_sums.get(name, 0) + amount
+
+def _debit(sums, counts, key, amounts):
+    counts[key] -= 1
+    if not counts[key]:
+        #start from exactly zero again rather than accumulate rounding
+        del counts[key]
+        del sums[key]
+        return
+    key_sums = sums[key]
+    for name, amount in amounts.items():
+        key_sums[name] -= amount
+
+def _add(agent_id, framework_id, amounts):
+    _credit(reserved, holders, agent_id, amounts)
+    _credit(frameworkReserved, frameworkHolders, framework_id, amounts)
+    resource_matrix.matrix.set_reserved(agent_id, reserved.get(agent_id, {}))
+
+def _subtract(agent_id, framework_id, amounts):
+    _debit(reserved, holders, agent_id, amounts)
+    _debit(frameworkReserved, frameworkHolders, framework_id, amounts)
+    resource_matrix.matrix.set_reserved(agent_id, reserved.get(agent_id, {}))
+
+def _release(task_id):
+    _subtract(*reservations.pop(task_id))
+
+def on_change(table, key, message):
+    if table != 'task':
+        return
+    with lock:
+        held = reservations.get(key)
+        if message is None or (message.HasField('state') and message.state in RELEASED_STATES):
+            if held is not None:
+                _release(key)
+            return
+        if held is not None:
+            if held[:2] == (message.agent_id, message.framework.framework_id):
+                return
+            _release(key)
+        held = (message.agent_id, message.framework.framework_id, scalars(message))
+        reservations[key] = held
+        _add(*held)
+
+db.change_listeners.append(on_change)
+
+def hold(offer):
+    held = (offer.agent_id, offer.framework_id, scalars(offer))
+    with lock:
+        offerHolds[offer.id] = held
+        _add(*held)
+
+def unhold(offer_id):
+    with lock:
+        held = offerHolds.pop(offer_id, None)
+        if held is not None:
+            _subtract(*held)
+
+def get_reserved(agent_id):
+    with lock:
+        return dict(reserved.get(agent_id, {}))
+
+def get_framework_reserved(framework_id):
+    with lock:
+        return dict(frameworkReserved.get(framework_id, {}))
+
+def get_reserving_frameworks():
+    with lock:
+        return list(frameworkReserved)
+
+def available(agent):
+    # the agent's resources less what is reserved or offered on it
+    agent_reserved = get_reserved(agent.id)
+    resources = []
+    for resource in agent.resources:
+        if resource.type == messages_pb2.Value.SCALAR and resource.name in agent_reserved:
+            remaining = messages_pb2.Resource()
+            remaining.CopyFrom(resource)
+            remaining.scalar.value = round(max(resource.scalar.value - agent_reserved[resource.name], 0), 3)
+            resources.append(remaining)
+        else:
+            resources.append(resource)
+    return resources
@@ -1,4 +1,11 @@
+import bisect
+import collections
+import heapq
+import itertools
+import json
+import liveness
 import messages_pb2
+import taskarchive
 import threading
 import time
 import uuid
@@ -13,104 +20,728 @@ agentsDict = {}
 #same for tasks
 tasks = {}
 
+#indexes over tasks so the ping path never has to scan every task
+#tasksByState maps a TaskState to the set of task_ids in that state
+#tasksByAgent maps an agent_id to its task_ids in submission order
+#(as dict keys, so removal is O(1))
+#tasksByFramework maps a framework_id to the set of its task_ids
+#unissuedQueues maps an agent_id to a FIFO of its UNISSUED task_ids
+tasksByState = {}
+tasksByAgent = {}
+tasksByFramework = {}
+unissuedQueues = {}
+
+class SeqIndex:
+    # The seqs of the tasks under each key of an index, kept sorted so a
+    # query can start at its cursor and stop once its page is full
+    # instead of collecting and sorting every match.
+    def __init__(self):
+        self.seqs = {}
+
+    def add(self, key, seq):
+        seqs = self.seqs.setdefault(key, [])
+        i = bisect.bisect_left(seqs, seq)
+        if i == len(seqs) or seqs[i] != seq:
+            seqs.insert(i, seq)
+
+    def discard(self, key, seq):
+        seqs = self.seqs.get(key)
+        if seqs is None:
+            return
+        i = bisect.bisect_left(seqs, seq)
+        if i < len(seqs) and seqs[i] == seq:
+            del seqs[i]
+            if not seqs:
+                del self.seqs[key]
+
+    def count(self, keys):
+        return sum([len(self.seqs.get(key, ())) for key in keys])
+
+    def from_seq(self, keys, lo):
+        # the seqs under any of keys from lo on, in order
+        def walk(seqs):
+            for i in range(bisect.bisect_left(seqs, lo), len(seqs)):
+                yield seqs[i]
+        return heapq.merge(*[walk(self.seqs.get(key, [])) for key in keys])
+
+stateSeqs = SeqIndex()
+agentSeqs = SeqIndex()
+frameworkSeqs = SeqIndex()
+
+#tasks in the order the master first saw them. A task's seq is its
+#position counting from taskOrderBase and is what API cursors refer to.
+#taskSubmitTimes (ms) runs parallel to taskOrder so time ranges map to
+#seq ranges with a bisect. Archived tasks leave a None hole that is
+#trimmed once it reaches the front.
+taskOrder = []
+taskSubmitTimes = []
+taskOrderBase = 0
+taskSeqs = {}
+
+#Terminal tasks are moved out of memory once they exceed the retention
+#age or count. terminalTasks maps task_id -> time it became terminal,
+#oldest first. Archived tasks keep a compact record in archivedTasks
+#(bounded by archived_index_size) and their full TaskInfo on disk.
+#archiveOffsets maps every task_id in the archive file to its record,
+#and both are rebuilt from the file when the master starts.
+TERMINAL_STATES = (messages_pb2.TaskInfo.TaskState.COMPLETED,
+                   messages_pb2.TaskInfo.TaskState.ERRORED,
+                   messages_pb2.TaskInfo.TaskState.KILLED)
+terminalTasks = collections.OrderedDict()
+archivedTasks = collections.OrderedDict()
+archiveOffsets = {}
+retention = {
+    'max_age_ms': 60 * 60 * 1000,
+    'max_count': 10000,
+    'archived_index_size': 100000,
+}
+task_archive = None
+
+#agent ids kept sorted for cursor pagination of /agents
+agentIds = []
+
 #same for frameworks
 frameworks = {}
 frameworksDict = {}
 
+#The CoAP thread, the API thread and the reaper all share this state.
+#Updates to one agent (its record, expiry and task queue) are serialized
+#by that agent's stripe lock so pings from different agents don't
+#contend. agents, agentsDict and frameworks are copy-on-write: adding or
+#removing a key swaps in a new dict under registry_lock, so readers can
+#iterate them without locking. The task tables are guarded by tasks_lock,
+#which readers only hold long enough to copy what they need.
+NUM_STRIPES = 64
+agent_stripes = [threading.RLock() for i in range(NUM_STRIPES)]
+registry_lock = threading.Lock()
+tasks_lock = threading.RLock()
+
+class JsonView:
+    # The JSON array the REST API serves for one table. Each object's
+    # JSON is cached until the object changes and the array itself until
+    # anything in the table changes. Changes are stamped from a shared
+    # counter; the table's latest stamp is its ETag.
+    def __init__(self, render):
+        self.render = render
+        self.stamps = {}
+        self.cache = {}
+        self.version = next(view_stamps)
+        self.body = None
+
+    def invalidate(self, key):
+        stamp = next(view_stamps)
+        self.stamps[key] = stamp
+        self.version = stamp
+
+    def remove(self, key):
+        self.stamps.pop(key, None)
+        self.cache.pop(key, None)
+        self.version = next(view_stamps)
+
+    def json_for(self, key, obj):
+        #a render that raced with a change is stored under the old stamp
+        #and so is never served once the change is visible
+        stamp = self.stamps.get(key)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        text = json.dumps(self.render(key, obj))
+        self.cache[key] = (stamp, text)
+        return text
+
+    def get(self, snapshot):
+        #returns (etag, body). The version is read before the snapshot so
+        #the body is never older than the ETag it is served with.
+        version = self.version
+        body = self.body
+        if body is None or body[0] != version:
+            text = '[' + ','.join([self.json_for(key, obj) for key, obj in snapshot()]) + ']'
+            body = (version, text)
+            self.body = body
+        return boot_id + '-' + str(version), body[1]
+
+#agents are expired this many ping periods after their last ping
+STALE_PING_PERIODS = 2
+DEFAULT_PING_RATE = 5000
+
+#callbacks run with the agent_id whenever an agent is expired
+agent_expiry_hooks = []
+
+#callbacks run as listener(table, key, message) whenever an agent, task
+#or framework ('agent', 'task', 'framework') is stored or, with message
+#None, removed. They run under the state locks so must only queue work.
+change_listeners = []
+
+def _notify(table, key, message):
+    for listener in change_listeners:
+        listener(table, key, message)
+
+def _render_agent(agent_id, agent):
+    agent_as_dict = MessageToDict(agent)
+    agent_as_dict.update(agentsDict.get(agent_id, {}))
+    return agent_as_dict
+
+def _render_message(key, message):
+    return MessageToDict(message)
+
+#ETags are only meaningful for this run of the master
+boot_id = uuid.uuid4().hex[:8]
+view_stamps = itertools.count()
+agents_view = JsonView(_render_agent)
+tasks_view = JsonView(_render_message)
+frameworks_view = JsonView(_render_message)
+
 def get_offer_id():
     return str(uuid.uuid4())
 
-def refresh_agent(aid, agent):
+def agent_lock(agent_id):
+    return agent_stripes[hash(agent_id) % NUM_STRIPES]
+
+def _cow_put(table, key, value):
+    #returns the table to publish after setting key. Replacing a value
+    #doesn't change the dict's size so it is done in place.
+    if key in table:
+        table[key] = value
+        return table
+    table = dict(table)
+    table[key] = value
+    return table
+
+def _cow_delete(table, key):
+    table = dict(table)
+    table.pop(key, None)
+    return table
+
+def _stale_deadline(aid):
+    ping_rate = DEFAULT_PING_RATE
+    if agents[aid].ping_rate:
+        ping_rate = agents[aid].ping_rate
+    return agentsDict[aid]['lastPing'] + ping_rate * STALE_PING_PERIODS
+
+def ping_in_sync(aid, ping):
+    #returns False if a delta ping can't be applied and the agent must resync
+    if not ping.seq or ping.full_sync or not ping.ack_seq:
+        return True
+    if aid not in agentsDict or 'seq' not in agentsDict[aid]:
+        #we have no record of acknowledging anything for this agent
+        return False
+    #the agent's delta is based on a ping we never acknowledged
+    return ping.ack_seq <= agentsDict[aid]['seq']
+
+def refresh_agent(aid, agent, seq=None):
+    global agents, agentsDict
     agent.id = aid
-    agents[aid] = agent
-    if aid not in agentsDict:
-        agentsDict[aid] = {}
-        agentsDict[aid]['lastPing'] = time.time()*1000
-    else:
-        agentsDict[aid]['lastPing'] = time.time()*1000
+    with agent_lock(aid):
+        #readers may hold the old info dict, so never modify it in place
+        info = dict(agentsDict.get(aid, {}))
+        info['lastPing'] = time.time()*1000
+        if seq:
+            info['seq'] = seq
+        with registry_lock:
+            if aid not in agents:
+                bisect.insort(agentIds, aid)
+            agents = _cow_put(agents, aid, agent)
+            agentsDict = _cow_put(agentsDict, aid, info)
+        agents_view.invalidate(aid)
+        _notify('agent', aid, agent)
+
+        agent_timer.schedule(aid, _stale_deadline(aid))
 
     return aid
 
+def refresh_liveness():
+    #restart every agent's stale window from now, for a master that has
+    #just taken over agents whose pings went to someone else
+    global agentsDict
+    now = time.time()*1000
+    for aid in list(agents):
+        with agent_lock(aid):
+            if aid not in agentsDict:
+                continue
+            info = dict(agentsDict[aid])
+            info['lastPing'] = now
+            with registry_lock:
+                agentsDict = _cow_put(agentsDict, aid, info)
+            agent_timer.schedule(aid, _stale_deadline(aid))
+
+def _set_task_state(task, state):
+    old_state = task.state if task.HasField('state') else None
+    if old_state in tasksByState:
+        tasksByState[old_state].discard(task.task_id)
+    task.state = state
+    tasksByState.setdefault(state, set()).add(task.task_id)
+    if old_state != state:
+        seq = taskSeqs[task.task_id]
+        if old_state is not None:
+            stateSeqs.discard(old_state, seq)
+        stateSeqs.add(state, seq)
+        tasks_view.invalidate(task.task_id)
+        _track_terminal(task.task_id, state)
+        _notify('task', task.task_id, task)
+    if state == messages_pb2.TaskInfo.TaskState.UNISSUED and old_state != state:
+        unissuedQueues.setdefault(task.agent_id, collections.deque()).append(task.task_id)
+
+def _track_terminal(task_id, state):
+    if state in TERMINAL_STATES:
+        terminalTasks[task_id] = time.time() * 1000
+        terminalTasks.move_to_end(task_id)
+    else:
+        terminalTasks.pop(task_id, None)
+
+def _store_task(task, submitted=None):
+    #insert or replace a task keeping the indexes in sync
+    old = tasks.get(task.task_id)
+    if old is not None:
+        seq = taskSeqs[task.task_id]
+        if old.HasField('state') and old.state in tasksByState:
+            tasksByState[old.state].discard(task.task_id)
+            stateSeqs.discard(old.state, seq)
+        if old.agent_id != task.agent_id:
+            del tasksByAgent[old.agent_id][task.task_id]
+            tasksByAgent.setdefault(task.agent_id, {})[task.task_id] = None
+            agentSeqs.discard(old.agent_id, seq)
+            agentSeqs.add(task.agent_id, seq)
+        if old.framework.framework_id != task.framework.framework_id:
+            tasksByFramework[old.framework.framework_id].discard(task.task_id)
+            tasksByFramework.setdefault(task.framework.framework_id, set()).add(task.task_id)
+            frameworkSeqs.discard(old.framework.framework_id, seq)
+            frameworkSeqs.add(task.framework.framework_id, seq)
+    else:
+        seq = taskOrderBase + len(taskOrder)
+        tasksByAgent.setdefault(task.agent_id, {})[task.task_id] = None
+        tasksByFramework.setdefault(task.framework.framework_id, set()).add(task.task_id)
+        agentSeqs.add(task.agent_id, seq)
+        frameworkSeqs.add(task.framework.framework_id, seq)
+        taskSeqs[task.task_id] = seq
+        taskOrder.append(task.task_id)
+        #keep the times sorted even if the clock steps backwards
+        if submitted is None:
+            submitted = time.time() * 1000
+        if taskSubmitTimes and submitted < taskSubmitTimes[-1]:
+            submitted = taskSubmitTimes[-1]
+        taskSubmitTimes.append(submitted)
+    tasks[task.task_id] = task
+    if task.HasField('state'):
+        tasksByState.setdefault(task.state, set()).add(task.task_id)
+        stateSeqs.add(task.state, seq)
+        _track_terminal(task.task_id, task.state)
+    tasks_view.invalidate(task.task_id)
+    _notify('task', task.task_id, task)
+
+def task_submit_time(task_id):
+    with tasks_lock:
+        return taskSubmitTimes[taskSeqs[task_id] - taskOrderBase]
+
 def refresh_tasks(new_tasks):
     #update teh tasks
-    for task in new_tasks:
-        #if the task already exists
-        if task.task_id in tasks and task.state:
-            tasks[task.task_id].state = task.state
-            if task.error_message:
-                tasks[task.task_id].error_message = task.error_message
-        else:
-            #if it doesn't
-            tasks[task.task_id] = task
+    with tasks_lock:
+        for task in new_tasks:
+            #agents keep reporting finished tasks on full syncs
+            if _is_archived(task.task_id):
+                continue
+            #if the task already exists
+            #COMPLETED is 0, so check whether a state was sent at all
+            if task.task_id in tasks and task.HasField('state'):
+                stored = tasks[task.task_id]
+                _set_task_state(stored, task.state)
+                changed = False
+                if task.error_message and task.error_message != stored.error_message:
+                    stored.error_message = task.error_message
+                    changed = True
+                if task.log_digest and task.log_digest != stored.log_digest:
+                    stored.log_digest = task.log_digest
+                    stored.log_size = task.log_size
+                    changed = True
+                if changed:
+                    tasks_view.invalidate(task.task_id)
+                    _notify('task', task.task_id, stored)
+            else:
+                #if it doesn't
+                _store_task(task)
 
 def add_task(runtaskmsg):
+    global frameworks
     task_id = runtaskmsg.task.task_id
 
     # Save the task and update state
-    tasks[task_id] = runtaskmsg.task
-    tasks[task_id].state = messages_pb2.TaskInfo.TaskState.UNISSUED
+    task = runtaskmsg.task
+    task.ClearField('state')
+    with tasks_lock:
+        _store_task(task)
+        _set_task_state(task, messages_pb2.TaskInfo.TaskState.UNISSUED)
 
     # At the same time add the frameworks
     framework_id = runtaskmsg.task.framework.framework_id
-    frameworks[framework_id] = runtaskmsg.task.framework
+    with registry_lock:
+        if frameworks.get(framework_id) != runtaskmsg.task.framework:
+            frameworks = _cow_put(frameworks, framework_id, runtaskmsg.task.framework)
+            frameworks_view.invalidate(framework_id)
+            _notify('framework', framework_id, runtaskmsg.task.framework)
 
     return task_id
 
+def snapshot_state():
+    #copies of every agent, (task, submitted) in submission order and
+    #framework, in the form restore() takes
+    with tasks_lock:
+        task_list = []
+        for i, task_id in enumerate(taskOrder):
+            if task_id is not None:
+                task = messages_pb2.TaskInfo()
+                task.CopyFrom(tasks[task_id])
+                task_list.append((task, taskSubmitTimes[i]))
+    return list(agents.values()), task_list, list(frameworks.values())
+
+def restore(agent_list, task_list, framework_list, agent_seqs=None):
+    #load state saved by a previous master, replacing any existing
+    #entries. Tasks must be in submission order as (task, submitted)
+    #pairs. agent_seqs optionally maps an agent_id to the last ping seq
+    #acknowledged to it. Restored agents get a full ping period of grace
+    #before they are expired.
+    global frameworks
+    with registry_lock:
+        for framework in framework_list:
+            frameworks = _cow_put(frameworks, framework.framework_id, framework)
+            frameworks_view.invalidate(framework.framework_id)
+    with tasks_lock:
+        for task, submitted in task_list:
+            #archived before its removal reached the store
+            if _is_archived(task.task_id):
+                continue
+            #COMPLETED is 0, so only restore a state that was set
+            state = task.state if task.HasField('state') else None
+            task.ClearField('state')
+            _store_task(task, submitted)
+            if state is not None:
+                _set_task_state(task, state)
+    for agent in agent_list:
+        seq = None
+        if agent_seqs is not None:
+            seq = agent_seqs.get(agent.id)
+        refresh_agent(agent.id, agent, seq)
+
 def get_tasks_by_agent(agent_id):
-    tasks_by_agent = []
-    for task_id, task in tasks.items():
-        if task.agent_id == agent_id:
-            tasks_by_agent.append(task)
+    with tasks_lock:
+        return [tasks[task_id] for task_id in tasksByAgent.get(agent_id, {})]
+
+def get_tasks_by_state(state):
+    with tasks_lock:
+        return [tasks[task_id] for task_id in tasksByState.get(state, ())]
+
+def _varint_len(value):
+    length = 1
+    while value >= 0x80:
+        value >>= 7
+        length += 1
+    return length
+
+def run_task_encoded_len(task):
+    #bytes a task adds to a pong as a repeated RunTaskMessage entry
+    task_len = task.ByteSize()
+    run_task_len = 1 + _varint_len(task_len) + task_len
+    return 1 + _varint_len(run_task_len) + run_task_len
+
+def get_next_unissued_tasks_by_agent(agent_id, max_tasks, max_bytes):
+    #pop as many queued tasks as fit the count and byte budget. The first
+    #task is always returned so an oversized task can't block the queue.
+    issued = []
+    used = 0
+    with agent_lock(agent_id), tasks_lock:
+        queue = unissuedQueues.get(agent_id)
+        while queue and len(issued) < max_tasks:
+            task = tasks.get(queue[0])
+            if task is None or task.state != messages_pb2.TaskInfo.TaskState.UNISSUED \
+                    or task.agent_id != agent_id:
+                queue.popleft()
+                continue
+            size = run_task_encoded_len(task)
+            if issued and used + size > max_bytes:
+                break
+            queue.popleft()
+            _set_task_state(task, messages_pb2.TaskInfo.TaskState.ISSUED)
+            issued.append(task)
+            used += size
+    return issued
 
-    return tasks_by_agent
-    
 def get_next_unissued_task_by_agent(agent_id):
-    for task_id, task in tasks.items():
-        if task.agent_id == agent_id and task.state == messages_pb2.TaskInfo.TaskState.UNISSUED:
-            task.state = messages_pb2.TaskInfo.TaskState.ISSUED
-            return task
+    issued = get_next_unissued_tasks_by_agent(agent_id, 1, 0)
+    if issued:
+        return issued[0]
 
 def get_all_tasks():
-    return tasks.values()
+    with tasks_lock:
+        return list(tasks.values())
+
+def get_all_agents():
+    return list(agents.values())
 
-def get_all_tasks_as_dict():
-    tasks_as_dict = {}
-    for task_id, task in tasks.items():
-        tasks_as_dict[task_id] = MessageToDict(task)
+def get_agents_json():
+    return agents_view.get(lambda: list(agents.items()))
 
-    return tasks_as_dict.values()
+def get_tasks_json():
+    def snapshot():
+        with tasks_lock:
+            return list(tasks.items())
+    return tasks_view.get(snapshot)
 
-def get_all_agents():
-    return agents.values()
+def get_frameworks_json():
+    return frameworks_view.get(lambda: list(frameworks.items()))
+
+def query_tasks(states=None, agent_id=None, framework_id=None, since=None, until=None,
+                cursor=0, limit=100):
+    #returns up to limit matching tasks in submission order starting at
+    #seq cursor, and the cursor of the next page (None on the last page).
+    #since/until bound the submission time in ms.
+    with tasks_lock:
+        lo = max(cursor, taskOrderBase)
+        hi = taskOrderBase + len(taskOrder)
+        if since is not None:
+            lo = max(lo, taskOrderBase + bisect.bisect_left(taskSubmitTimes, since))
+        if until is not None:
+            hi = min(hi, taskOrderBase + bisect.bisect_right(taskSubmitTimes, until))
+
+        #walk the smallest index that applies from the cursor, in seq
+        #order, checking the other filters per task, until the page and
+        #the first seq of the next one are found
+        candidates = []
+        if states is not None:
+            candidates.append((stateSeqs, list(states)))
+        if agent_id is not None:
+            candidates.append((agentSeqs, [agent_id]))
+        if framework_id is not None:
+            candidates.append((frameworkSeqs, [framework_id]))
+
+        if candidates:
+            index, keys = min(candidates, key=lambda candidate: candidate[0].count(candidate[1]))
+            walk = index.from_seq(keys, lo)
+        else:
+            walk = range(lo, hi)
+        seqs = []
+        for seq in walk:
+            if seq >= hi or len(seqs) > limit:
+                break
+            task_id = taskOrder[seq - taskOrderBase]
+            if task_id is None:
+                #archived
+                continue
+            task = tasks[task_id]
+            if states is not None and task.state not in states:
+                continue
+            if agent_id is not None and task.agent_id != agent_id:
+                continue
+            if framework_id is not None and task.framework.framework_id != framework_id:
+                continue
+            seqs.append(seq)
+
+        page = [tasks[taskOrder[seq - taskOrderBase]] for seq in seqs[:limit]]
+        next_cursor = None
+        if len(seqs) > limit:
+            next_cursor = seqs[limit]
+        return page, next_cursor
+
+def get_task(task_id):
+    #the live task, or the full record of an archived one read from disk
+    with tasks_lock:
+        if task_id in tasks:
+            return tasks[task_id]
+        offset = archiveOffsets.get(task_id)
+    if offset is not None:
+        return task_archive.read(offset)
+    return None
+
+def configure_retention(max_age_ms=None, max_count=None, archived_index_size=None, archive_path=None):
+    global task_archive
+    if max_age_ms is not None:
+        retention['max_age_ms'] = max_age_ms
+    if max_count is not None:
+        retention['max_count'] = max_count
+    if archived_index_size is not None:
+        retention['archived_index_size'] = archived_index_size
+    if archive_path is not None:
+        if task_archive is not None:
+            task_archive.close()
+        task_archive = taskarchive.TaskArchive(archive_path)
+        _load_archive()
 
-def get_all_agents_as_dict():
-    agents_as_dict = {}
-    for agent_id, agent in agents.items():
-        agents_as_dict[agent_id] = MessageToDict(agent)
-        agents_as_dict[agent_id].update(agentsDict[agent_id])
+def _load_archive():
+    #index the tasks archived by earlier runs
+    with tasks_lock:
+        archiveOffsets.clear()
+        archivedTasks.clear()
+        for offset, finished, task in task_archive.scan():
+            archiveOffsets[task.task_id] = offset
+            archivedTasks[task.task_id] = _compact_task(task, finished, offset)
+            archivedTasks.move_to_end(task.task_id)
+            if len(archivedTasks) > retention['archived_index_size']:
+                archivedTasks.popitem(last=False)
 
-    return agents_as_dict.values()
+def _is_archived(task_id):
+    return task_id in archivedTasks or task_id in archiveOffsets
+
+def _remove_task(task_id):
+    #drop a task from the task table and every index
+    task = tasks.pop(task_id)
+    seq = taskSeqs[task_id]
+    if task.HasField('state') and task.state in tasksByState:
+        tasksByState[task.state].discard(task_id)
+        stateSeqs.discard(task.state, seq)
+    agentSeqs.discard(task.agent_id, seq)
+    frameworkSeqs.discard(task.framework.framework_id, seq)
+    terminalTasks.pop(task_id, None)
+    agent_tasks = tasksByAgent.get(task.agent_id)
+    if agent_tasks is not None:
+        agent_tasks.pop(task_id, None)
+        if not agent_tasks:
+            del tasksByAgent[task.agent_id]
+    framework_tasks = tasksByFramework.get(task.framework.framework_id)
+    if framework_tasks is not None:
+        framework_tasks.discard(task_id)
+        if not framework_tasks:
+            del tasksByFramework[task.framework.framework_id]
+    taskOrder[taskSeqs.pop(task_id) - taskOrderBase] = None
+    tasks_view.remove(task_id)
+    _notify('task', task_id, None)
+    return task
+
+def _trim_task_order():
+    #trim archived holes off the front of the submission order
+    global taskOrderBase
+    trim = 0
+    while trim < len(taskOrder) and taskOrder[trim] is None:
+        trim += 1
+    if trim:
+        del taskOrder[:trim]
+        del taskSubmitTimes[:trim]
+        taskOrderBase += trim
+
+def forget_task(task_id):
+    #remove a task without archiving it
+    with tasks_lock:
+        if task_id in tasks:
+            _remove_task(task_id)
+            _trim_task_order()
+
+def _compact_task(task, finished, offset):
+    return {
+        'taskId': task.task_id,
+        'name': task.name,
+        'agentId': task.agent_id,
+        'frameworkId': task.framework.framework_id,
+        'state': messages_pb2.TaskInfo.TaskState.Name(task.state),
+        'finished': finished,
+        'archiveOffset': offset,
+    }
+
+def _archive_task(task_id, finished):
+    task = _remove_task(task_id)
+    offset = archiveOffsets.get(task_id)
+    if offset is None and task_archive is not None:
+        offset = task_archive.append(task, finished)
+        archiveOffsets[task_id] = offset
+    archivedTasks[task_id] = _compact_task(task, finished, offset)
+    archivedTasks.move_to_end(task_id)
+
+def compact_tasks():
+    #archive terminal tasks past the retention age or count, oldest first
+    now = time.time() * 1000
+    archived = 0
+    with tasks_lock:
+        while terminalTasks:
+            task_id, finished = next(iter(terminalTasks.items()))
+            if len(terminalTasks) <= retention['max_count'] and \
+                    now - finished <= retention['max_age_ms']:
+                break
+            del terminalTasks[task_id]
+            _archive_task(task_id, finished)
+            archived += 1
+
+        if archived:
+            #forget the oldest compact records past the index size
+            while len(archivedTasks) > retention['archived_index_size']:
+                archivedTasks.popitem(last=False)
+
+            _trim_task_order()
+
+            if task_archive is not None:
+                task_archive.flush()
+    return archived
+
+def query_agents(cursor=None, limit=100):
+    #returns up to limit agents ordered by id after the agent_id cursor,
+    #and the cursor of the next page (None on the last page)
+    ids = agentIds
+    start = 0
+    if cursor is not None:
+        start = bisect.bisect_right(ids, cursor)
+    page = []
+    snapshot = agents
+    for agent_id in ids[start:start + limit]:
+        if agent_id in snapshot:
+            page.append((agent_id, snapshot[agent_id]))
+    next_cursor = None
+    if start + limit < len(ids) and page:
+        next_cursor = page[-1][0]
+    return page, next_cursor
 
 def get_all_frameworks():
-    return frameworks.values()
+    return list(frameworks.values())
 
-def get_all_frameworks_as_dict():
-    frameworks_as_dict = {}
-    for framework_id, framework in frameworks.items():
-        frameworks_as_dict[framework_id] = MessageToDict(framework)
+def mark_agent_tasks_lost(agent_id):
+    with tasks_lock:
+        for task in get_tasks_by_agent(agent_id):
+            if task.state in (messages_pb2.TaskInfo.TaskState.ISSUED,
+                              messages_pb2.TaskInfo.TaskState.STARTING,
+                              messages_pb2.TaskInfo.TaskState.RUNNING):
+                _set_task_state(task, messages_pb2.TaskInfo.TaskState.LOST)
 
-    return frameworks_as_dict.values()
+agent_expiry_hooks.append(mark_agent_tasks_lost)
 
-def clear_stale_agents():
-    agents_to_remove = []
-    for agent_id in agents.keys():
-        ping_rate = 5000
-        if agents[agent_id].ping_rate:
-            ping_rate = agents[agent_id].ping_rate
-        elapsed = time.time() * 1000 - agentsDict[agent_id]['lastPing']
-        if elapsed > ping_rate * 2:
-            agents_to_remove.append(agent_id)
-    for agent_id in agents_to_remove:
+def _remove_agent(agent_id):
+    global agents, agentsDict
+    with registry_lock:
+        del agentIds[bisect.bisect_left(agentIds, agent_id)]
+        agents = _cow_delete(agents, agent_id)
+        agentsDict = _cow_delete(agentsDict, agent_id)
+    agents_view.remove(agent_id)
+    agent_timer.cancel(agent_id)
+    _notify('agent', agent_id, None)
+
+def forget_agent(agent_id):
+    #remove an agent without running the expiry hooks
+    with agent_lock(agent_id):
+        if agent_id in agents:
+            _remove_agent(agent_id)
+
+def expire_agent(agent_id):
+    with agent_lock(agent_id):
+        if agent_id not in agents:
+            return
+        #the agent may have pinged after its timer fired
+        deadline = _stale_deadline(agent_id)
+        if deadline > time.time() * 1000:
+            agent_timer.schedule(agent_id, deadline)
+            return
         print("Deleting agent " + str(agent_id))
-        del agents[agent_id]
-        del agentsDict[agent_id]
+        _remove_agent(agent_id)
+        for hook in agent_expiry_hooks:
+            hook(agent_id)
+
+agent_timer = liveness.TimerWheel(expire_agent)
+
+def _maintain(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            compact_tasks()
+        except Exception as e:
+            print("Compaction error: " + str(e))
+
+def start_reaper():
+    #expire agents and archive old tasks from background threads
+    #instead of on each request
+    agent_timer.start()
+    threading.Thread(target=_maintain, args=(1,), name="maintenance", daemon=True).start()
+
+def clear_stale_agents():
+    #sweep any timer slots that have come due since the last sweep
+    agent_timer.advance()
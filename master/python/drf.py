@@ -0,0 +1,246 @@
+import heapq
+import threading
+import time
+
+import numpy as np
+
+import messages_pb2
+
+import allocator
+import db
+import offers
+import resource_matrix
+
+# Weighted dominant resource fairness for resource offers.
+#
+# A framework's share of a resource is what its tasks and outstanding
+# offers hold over the cluster's total, and its dominant share is the
+# largest of those over its role's weight. Requests are served lowest
+# dominant share first: frameworks whose last request was cut short
+# within active_ms still want more, and those with a lower dominant share
+# than the requester are taken from a heap, lowest first, and each keeps
+# back enough free resources to rise to the requester's dominant share.
+# The requester is offered everything else, so free resources no
+# lower-share framework wants are never held back. When a framework asks,
+# others above both their fair dominant share (1 / sum of active weights)
+# and the requester's have their largest outstanding offers rescinded
+# until they are back within it, rather than locking the requester out
+# until those offers expire.
+#
+# Agents are ranked from the resource matrix with array operations and
+# taken from a heap, roomiest first, until the framework's budget runs
+# out, instead of sorting every agent.
+
+DRF_RESOURCES = ("cpus", "mem")
+
+settings = {
+    'role_weights': {},
+    'active_ms': 30000,
+}
+
+#frameworkRoles maps a framework_id to the role it asked for offers
+#under, lastRequest to when it last asked and unmet to when its last
+#request was cut short to leave room for lower-share frameworks
+frameworkRoles = {}
+lastRequest = {}
+unmet = {}
+lock = threading.Lock()
+
+def parse_role_weights(text):
+    # "role=weight,role=weight"
+    weights = {}
+    for pair in text.split(','):
+        if not pair.strip():
+            continue
+        role, weight = pair.split('=')
+        weights[role.strip()] = float(weight)
+        if weights[role.strip()] <= 0:
+            raise ValueError("role weights must be positive")
+    return weights
+
+def configure(role_weights=None, active_ms=None):
+    if role_weights is not None:
+        settings['role_weights'] = role_weights
+    if active_ms is not None:
+        settings['active_ms'] = active_ms
+
+def role_of(framework_id):
+    role = frameworkRoles.get(framework_id)
+    if role is None:
+        framework = db.frameworks.get(framework_id)
+        if framework is not None and framework.role:
+            role = framework.role
+    return role
+
+def weight_of(framework_id):
+    return settings['role_weights'].get(role_of(framework_id), 1.0)
+
+def _active_frameworks(now):
+    cutoff = now - settings['active_ms']
+    active = set(allocator.get_reserving_frameworks())
+    with lock:
+        for framework_id, requested in list(lastRequest.items()):
+            if requested >= cutoff:
+                active.add(framework_id)
+            elif framework_id not in active:
+                del lastRequest[framework_id]
+    return active
+
+def _wanting_frameworks(now):
+    cutoff = now - settings['active_ms']
+    with lock:
+        for framework_id, cut in list(unmet.items()):
+            if cut < cutoff:
+                del unmet[framework_id]
+        return set(unmet)
+
+def dominant_share(framework_id, totals, held=None):
+    # the largest share of any DRF resource the framework holds, over its
+    # weight
+    if held is None:
+        held = allocator.get_framework_reserved(framework_id)
+    shares = [held.get(name, 0) / total for name, total in totals.items()]
+    return max(shares or [0]) / weight_of(framework_id)
+
+def _claim(framework_id, share, level, totals):
+    # what the framework needs to rise from its dominant share to level,
+    # spread over the resources like what it holds (evenly if nothing)
+    held = allocator.get_framework_reserved(framework_id)
+    fractions = dict([(name, held.get(name, 0) / total) for name, total in totals.items()])
+    largest = max(list(fractions.values()) or [0])
+    grow = (level - share) * weight_of(framework_id)
+    claim = {}
+    for name, total in totals.items():
+        profile = fractions[name] / largest if largest > 0 else 1.0
+        claim[name] = grow * total * profile
+    return claim
+
+def budget(framework_id, share, totals, free, now):
+    # what the framework may be offered of each DRF resource: what is
+    # free, less what the frameworks that still want more and have a
+    # lower dominant share need to catch up with it
+    left = dict(free)
+    heap = [(dominant_share(other, totals), other)
+            for other in _wanting_frameworks(now) if other != framework_id]
+    heapq.heapify(heap)
+    while heap and heap[0][0] < share and max(list(left.values()) or [0]) > 0:
+        other_share, other = heapq.heappop(heap)
+        for name, amount in _claim(other, other_share, share, totals).items():
+            left[name] = max(left[name] - amount, 0)
+    return left
+
+def _rescind_excess(framework_id, totals, limit):
+    # rescinds the framework's largest outstanding offers until its
+    # dominant share is back within limit. Offers within it are kept.
+    held = allocator.get_framework_reserved(framework_id)
+    if dominant_share(framework_id, totals, held) <= limit + 0.0005:
+        return
+    with offers.lock:
+        outstanding = [offers.outstanding[offer_id]
+                       for offer_id in offers.offersByFramework.get(framework_id, ())]
+    def largest_share(offer):
+        amounts = allocator.scalars(offer)
+        return max([amounts.get(name, 0) / total for name, total in totals.items()] or [0])
+    outstanding.sort(key=largest_share, reverse=True)
+    for offer in outstanding:
+        if dominant_share(framework_id, totals, held) <= limit + 0.0005:
+            break
+        if offers.rescind(offer.id) is None:
+            continue
+        print("Rescinding offer " + offer.id + " of framework " + framework_id + " beyond its fair share")
+        for name, amount in allocator.scalars(offer).items():
+            held[name] = held.get(name, 0) - amount
+
+def _attribute_matches(wanted, attributes):
+    for attribute in attributes:
+        if attribute.name != wanted.name or attribute.type != wanted.type:
+            continue
+        if wanted.type == messages_pb2.Value.TEXT:
+            return attribute.text.value == wanted.text.value
+        if wanted.type == messages_pb2.Value.SCALAR:
+            return attribute.scalar.value == wanted.scalar.value
+        if wanted.type == messages_pb2.Value.SET:
+            return set(wanted.set.item) <= set(attribute.set.item)
+        return attribute == wanted
+    return False
+
+def allocate(framework_id, role, min_resources=(), attributes=(), max_offers=0):
+    # yields the (agent, resources) to offer the framework: what isn't
+    # reserved or offered yet, capped by its budget. Only agents with
+    # min_resources free and all of the attributes are offered, and at
+    # most max_offers of them (0 for no limit). Agents are only picked as
+    # the caller asks for more, so paged requests pay for what they use.
+    now = time.time() * 1000
+    with lock:
+        lastRequest[framework_id] = now
+        unmet.pop(framework_id, None)
+        if role:
+            frameworkRoles[framework_id] = role
+
+    matrix = resource_matrix.matrix
+    all_totals = matrix.totals()
+    totals = dict([(name, all_totals[name]) for name in DRF_RESOURCES if all_totals.get(name)])
+
+    share = dominant_share(framework_id, totals)
+    active = _active_frameworks(now)
+    active.add(framework_id)
+    fair = 1.0 / sum([weight_of(f) for f in active])
+    for other in active:
+        if other != framework_id and other in offers.offersByFramework:
+            _rescind_excess(other, totals, max(fair, share))
+
+    agent_ids, columns, available = matrix.snapshot()
+    free = dict([(name, available[:, columns[name]].sum()) for name in totals])
+    allowed = budget(framework_id, share, totals, free, now)
+
+    # roomiest agent first: the largest share of any DRF resource it has
+    # free. Agents with nothing free at all are left out.
+    room = np.zeros(len(agent_ids))
+    for name, total in totals.items():
+        room = np.maximum(room, available[:, columns[name]] / total)
+    fits = (available > 0).any(axis=1)
+    minimums = {}
+    for resource in min_resources:
+        if resource.type == messages_pb2.Value.SCALAR:
+            minimums[resource.name] = resource.scalar.value
+    for name, minimum in minimums.items():
+        if name in columns:
+            fits &= available[:, columns[name]] >= minimum
+        elif minimum > 0:
+            fits[:] = False
+    candidates = fits.nonzero()[0]
+    heap = list(zip((-room[candidates]).tolist(), candidates.tolist()))
+    heapq.heapify(heap)
+
+    offered = 0
+    while heap and (not allowed or max(allowed.values()) > 0):
+        if max_offers and offered >= max_offers:
+            break
+        room, i = heapq.heappop(heap)
+        agent = db.agents.get(agent_ids[i])
+        if agent is None:
+            continue
+        if not all([_attribute_matches(wanted, agent.attributes) for wanted in attributes]):
+            continue
+        #the budget only shrinks, so once it can't cover the minimums no
+        #later agent fits either
+        if any([allowed.get(name, minimum) < minimum for name, minimum in minimums.items()]):
+            with lock:
+                unmet[framework_id] = now
+            break
+        capped = []
+        for resource in allocator.available(agent):
+            if resource.type == messages_pb2.Value.SCALAR and resource.name in allowed:
+                amount = min(resource.scalar.value, allowed[resource.name])
+                allowed[resource.name] -= amount
+                if amount < resource.scalar.value:
+                    with lock:
+                        unmet[framework_id] = now
+                if amount <= 0:
+                    continue
+                if amount < resource.scalar.value:
+                    resource = messages_pb2.Resource(name=resource.name, type=resource.type,
+                                                     scalar=messages_pb2.Value.Scalar(value=round(amount, 3)))
+            capped.append(resource)
+        offered += 1
+        yield agent, capped
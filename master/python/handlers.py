@@ -0,0 +1,267 @@
+import json
+import os
+
+import messages_pb2
+from google.protobuf.json_format import MessageToDict
+
+import db
+import drf
+import journal
+import offers
+import persist
+import replication
+import tasklogs
+
+# Request handling shared by the CoAPthon master (master.py) and the
+# asyncio master (master_async.py). Handlers take and return serialized
+# WrapperMessages so each server only deals with its own transport.
+
+def add_tasks_to_pong(wrapper, agent_id, max_tasks, pong_byte_budget):
+    # hand out as many queued tasks as fit in a single pong
+    # (leave room for the pong's length prefix to grow as tasks are added)
+    byte_budget = pong_byte_budget - wrapper.ByteSize() - 2
+    tasks_to_run = db.get_next_unissued_tasks_by_agent(agent_id, max_tasks, byte_budget)
+    if tasks_to_run:
+        print("Got " + str(len(tasks_to_run)) + " task(s) to schedule!!!")
+    for task in tasks_to_run:
+        wrapper.pong.run_tasks.add().task.CopyFrom(task)
+
+def handle_offer_request(payload):
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.ParseFromString(payload)
+    request = wrapper.request
+    framework_id = request.framework_id
+    role = request.role
+
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.offermsg.framework_id = framework_id
+    if request.cursor:
+        #next page of an earlier request. If the cursor has expired the
+        #framework gets an empty page and asks again from the start
+        print("\nGot resource offer page request! Framework \"" + framework_id + "\"\n")
+        pager = offers.resume(request.cursor, framework_id)
+        if pager is None:
+            return wrapper.SerializeToString()
+    else:
+        #construct resource offer
+        print("\nGot resource offer request! Framework \"" + framework_id + "\"\n")
+        #a new request replaces the framework's earlier offers
+        offers.rescind_framework(framework_id)
+
+        #offer the framework its fair share of the resources that aren't
+        #reserved by unfinished tasks or held by other outstanding offers
+        pager = offers.OfferPager(framework_id, drf.allocate(framework_id, role, request.min_resources,
+                                                             request.attributes, request.max_offers))
+
+    pager.fill(wrapper.offermsg, request.page_bytes or offers.settings['page_bytes'])
+    if not pager.done:
+        wrapper.offermsg.next_cursor = offers.park(pager)
+    return wrapper.SerializeToString()
+
+def handle_run_task(payload):
+    # returns the agent the task was queued for, the response payload and
+    # None, or (None, None, error) if the task doesn't fit a live offer
+    print("Received Task Request!")
+
+    # unpack request
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.ParseFromString(payload)
+
+    # print request (do nothing right now)
+    print("    Framework Name: " + wrapper.run_task.task.framework.name)
+    print("    Framework ID:   " + wrapper.run_task.task.framework.framework_id)
+    print("    Task Name:      " + wrapper.run_task.task.name)
+    print("    Task ID:        " + wrapper.run_task.task.task_id)
+    print("    Selected Agent: " + wrapper.run_task.task.agent_id)
+    for i in range(len(wrapper.run_task.task.resources)):
+        resource = wrapper.run_task.task.resources[i]
+        print("        Resource: (" + resource.name + ") type: " + str(resource.type) + " amt: " + str(resource.scalar).strip())
+
+    error = offers.claim(wrapper.run_task)
+    if error:
+        print("Rejected task: " + error)
+        return None, None, error
+    db.add_task(wrapper.run_task)
+    offers.release(wrapper.run_task)
+    agent_id = wrapper.run_task.task.agent_id
+
+    # construct response
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.pong.agent_id = "1234"
+    return agent_id, wrapper.SerializeToString(), None
+
+def handle_ping(payload, max_tasks_per_pong, pong_byte_budget):
+    # returns the pinging agent's id and the pong payload, or
+    # (None, None) if the ping didn't identify an agent
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.ParseFromString(payload)
+
+    agent_id = wrapper.ping.agent.id
+    agent_name = wrapper.ping.agent.name
+    if not agent_id:
+        return None, None
+    print("Ping! Agent ID:(" + str(agent_id) + ") Name:(" + str(agent_name) + ")")
+
+    #a delta ping is only usable if it builds on a ping we acknowledged
+    in_sync = db.ping_in_sync(agent_id, wrapper.ping)
+    seq = wrapper.ping.seq if in_sync else None
+
+    #refresh the agent timing
+    db.refresh_agent(agent_id, wrapper.ping.agent, seq)
+
+    #update the state of any tasks it may have sent
+    db.refresh_tasks(wrapper.ping.tasks)
+    for task_log in wrapper.ping.logs:
+        tasklogs.store(task_log)
+
+    # construct response
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.pong.agent_id = str(agent_id)
+    wrapper.pong.master_id = db.boot_id
+    if seq:
+        wrapper.pong.ack_seq = seq
+    if not in_sync:
+        print("Requesting full resync from agent " + str(agent_id))
+        wrapper.pong.resync = True
+    wrapper.pong.fetch_logs.extend(tasklogs.take_requests(agent_id))
+
+    add_tasks_to_pong(wrapper, agent_id, max_tasks_per_pong, pong_byte_budget)
+    return agent_id, wrapper.SerializeToString()
+
+# REST API queries. args is the request's query string mapping.
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+def _page_limit(args):
+    limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_LIMIT)
+
+def _json_page(view, items):
+    return '[' + ','.join([view.json_for(key, obj) for key, obj in items]) + ']'
+
+def is_paged_query(args):
+    return len(args) > 0
+
+def query_tasks(args):
+    # filters: state (comma separated TaskState names), agent_id,
+    # framework_id, since/until (submission time in ms since the epoch).
+    # Raises ValueError on a malformed query.
+    # Returns the JSON page and the cursor for the next one.
+    states = None
+    if args.get('state'):
+        states = set()
+        for name in args.get('state').split(','):
+            states.add(messages_pb2.TaskInfo.TaskState.Value(name.strip().upper()))
+    since = float(args['since']) if args.get('since') else None
+    until = float(args['until']) if args.get('until') else None
+    cursor = int(args.get('cursor', 0))
+    if cursor < 0:
+        raise ValueError("cursor must not be negative")
+    page, next_cursor = db.query_tasks(states=states,
+                                       agent_id=args.get('agent_id'),
+                                       framework_id=args.get('framework_id'),
+                                       since=since, until=until,
+                                       cursor=cursor, limit=_page_limit(args))
+    body = _json_page(db.tasks_view, [(task.task_id, task) for task in page])
+    return body, next_cursor
+
+def get_task(task_id):
+    # a single task as JSON, including archived ones (the full record when
+    # there is an archive file, otherwise the compact one); None if unknown
+    task = db.get_task(task_id)
+    if task is not None:
+        return json.dumps(MessageToDict(task))
+    compact = db.archivedTasks.get(task_id)
+    if compact is not None:
+        return json.dumps(compact)
+    return None
+
+def get_task_log(task_id):
+    # (status, body): the log its agent captured when the task exited, or
+    # 202 once it has been asked for it, in which case try again after
+    # the agent's next ping. 410 once the agent answered that it no longer
+    # has the log, 404 while the agent isn't connected.
+    task = db.get_task(task_id)
+    if task is None:
+        return 404, "unknown task"
+    if not task.log_digest:
+        return 404, "no log captured for task " + task_id
+    log = tasklogs.get(task_id, task.log_digest)
+    if log is not None:
+        return 200, log
+    if tasklogs.gone(task_id):
+        return 410, "agent " + task.agent_id + " no longer has the log of task " + task_id
+    if task.agent_id not in db.agents:
+        return 404, "agent " + task.agent_id + " of task " + task_id + " is not connected"
+    tasklogs.request(task.agent_id, task_id)
+    return 202, "log requested from agent " + task.agent_id + ", try again shortly"
+
+def query_agents(args):
+    # cursor is the last agent_id of the previous page
+    page, next_cursor = db.query_agents(cursor=args.get('cursor'), limit=_page_limit(args))
+    return _json_page(db.agents_view, page), next_cursor
+
+def render_push(agent_id, max_tasks_per_pong, pong_byte_budget):
+    # the pong sent to an agent observing its push resource
+    wrapper = messages_pb2.WrapperMessage()
+    wrapper.pong.agent_id = str(agent_id)
+    add_tasks_to_pong(wrapper, agent_id, max_tasks_per_pong, pong_byte_budget)
+    return wrapper.SerializeToString()
+
+# Command line options and startup shared by master.py and master_async.py
+
+DEFAULT_TASK_ARCHIVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tasks.archive')
+
+def add_master_args(parser):
+    parser.add_argument('--max-tasks-per-pong', required=False, type=int, default=16, help='the most tasks handed to an agent in one pong.')
+    parser.add_argument('--pong-byte-budget', required=False, type=int, default=1024, help='the encoded size a pong may grow to with tasks (one CoAP block by default).')
+    parser.add_argument('--retain-terminal-ms', required=False, type=int, default=3600000, help='how long finished tasks stay in memory before they are archived.')
+    parser.add_argument('--retain-terminal-count', required=False, type=int, default=10000, help='the most finished tasks kept in memory.')
+    parser.add_argument('--task-archive', required=False, default=DEFAULT_TASK_ARCHIVE, help='file to append archived task records to (tasks.archive next to the master by default).')
+    parser.add_argument('--no-task-archive', dest='task_archive', action='store_const', const=None, help='only keep a compact summary of archived tasks.')
+    parser.add_argument('--archive-index-size', required=False, type=int, default=100000, help='the most archived tasks that can still be looked up by id.')
+    durability = parser.add_mutually_exclusive_group()
+    durability.add_argument('--state-db', required=False, default=None, help='SQLite file to persist agents, tasks and frameworks to and restore them from on start.')
+    durability.add_argument('--journal-dir', required=False, default=None, help='directory for a journal and snapshots of the master state, restored from on start.')
+    parser.add_argument('--commit-interval-ms', required=False, type=int, default=100, help='how often queued state changes are committed to the state db or journal.')
+    parser.add_argument('--snapshot-every', required=False, type=int, default=10000, help='journal records written between snapshots.')
+    parser.add_argument('--offer-ttl-ms', required=False, type=int, default=10000, help='how long an offer holds its resources before it expires.')
+    parser.add_argument('--offer-page-bytes', required=False, type=int, default=1024, help='the encoded size an offer response may grow to before the rest is paged (one CoAP block by default).')
+    parser.add_argument('--max-task-logs', required=False, type=int, default=64, help='how many task logs fetched from agents to keep.')
+    parser.add_argument('--allow-offerless-tasks', required=False, action='store_true', help='accept tasks that were not launched against an offer.')
+    parser.add_argument('--role-weights', required=False, default='', help='fair share weights of framework roles as role=weight,... (roles default to 1).')
+    parser.add_argument('--drf-active-ms', required=False, type=int, default=30000, help='how long after its last offer request a framework without resources still counts towards fair shares.')
+    parser.add_argument('--replication-port', required=False, default=None, help='serve the state change stream to standby masters on this port.')
+    parser.add_argument('--standby-of', required=False, default=None, help='host:port of a leader\'s replication port; run as its hot standby and take over when it fails.')
+    parser.add_argument('--failover-timeout-ms', required=False, type=int, default=3000, help='how long a standby waits without hearing from the leader before taking over.')
+
+def configure_master(args):
+    # configures the master from its options, restores its state and,
+    # for a standby, follows the leader until it fails. Returns the open
+    # state store, or None.
+    db.configure_retention(args.retain_terminal_ms, args.retain_terminal_count,
+                           args.archive_index_size, args.task_archive)
+    offers.configure(args.offer_ttl_ms, not args.allow_offerless_tasks, args.offer_page_bytes)
+    tasklogs.configure(args.max_task_logs)
+    drf.configure(drf.parse_role_weights(args.role_weights), args.drf_active_ms)
+
+    store = None
+    if args.state_db:
+        store = persist.open_store(args.state_db, args.commit_interval_ms)
+    elif args.journal_dir:
+        store = journal.open_journal(args.journal_dir, args.snapshot_every, args.commit_interval_ms)
+
+    #follow a leader until it goes away, then take over its ports
+    if args.standby_of:
+        leader_host, leader_port = args.standby_of.rsplit(':', 1)
+        replication.Standby(leader_host, leader_port, args.failover_timeout_ms).follow()
+        #the agents pinged the leader until now, so don't count the
+        #failover timeout against them
+        db.refresh_liveness()
+
+    if args.replication_port:
+        replication.ReplicationServer(args.host, args.replication_port).start()
+
+    return store
@@ -0,0 +1,235 @@
+import os
+import struct
+import threading
+import time
+
+import messages_pb2
+
+import db
+
+# Append-only journal of the master's state changes with periodic
+# snapshots, so recovering is a snapshot load plus a short replay.
+#
+# Every change db.change_listeners report becomes a JournalRecord,
+# framed as a 4 byte big-endian length and the serialized record, and is
+# appended to the current segment (journal-<first seq>.log). A writer
+# thread flushes and fsyncs the segment every flush_interval_ms, so a
+# crash loses at most that interval. Once snapshot_every records have
+# been written it starts a new segment, writes the whole state to
+# snapshot.bin and deletes the segments the snapshot covers.
+
+LENGTH = struct.Struct(">I")
+SNAPSHOT = "snapshot.bin"
+
+def _segment_name(first_seq):
+    return "journal-%020d.log" % first_seq
+
+def write_frame(f, message):
+    data = message.SerializeToString()
+    f.write(LENGTH.pack(len(data)))
+    f.write(data)
+
+def read_frames(f):
+    # stops at a torn record left by a crash mid-write
+    while True:
+        header = f.read(LENGTH.size)
+        if len(header) < LENGTH.size:
+            return
+        length, = LENGTH.unpack(header)
+        data = f.read(length)
+        if len(data) < length:
+            return
+        yield data
+
+def record_for(table, key, message):
+    record = messages_pb2.JournalRecord()
+    if table == 'agent':
+        if message is None:
+            record.removed_agent_id = key
+        else:
+            record.agent.CopyFrom(message)
+            if 'seq' in db.agentsDict.get(key, {}):
+                record.ack_seq = db.agentsDict[key]['seq']
+    elif table == 'task':
+        if message is None:
+            record.removed_task_id = key
+        else:
+            record.task.CopyFrom(message)
+            record.submitted = db.task_submit_time(key)
+    else:
+        record.framework.CopyFrom(message)
+    return record
+
+def _apply(record, agents, agent_seqs, tasks, frameworks):
+    change = record.WhichOneof('change')
+    if change == 'agent':
+        agents[record.agent.id] = record.agent
+        agent_seqs[record.agent.id] = record.ack_seq if record.HasField('ack_seq') else None
+    elif change == 'task':
+        tasks[record.task.task_id] = (record.task, record.submitted)
+    elif change == 'framework':
+        frameworks[record.framework.framework_id] = record.framework
+    elif change == 'removed_agent_id':
+        agents.pop(record.removed_agent_id, None)
+    elif change == 'removed_task_id':
+        tasks.pop(record.removed_task_id, None)
+
+def build_snapshot(seq):
+    # the current state of db as a JournalSnapshot numbered seq
+    snapshot = messages_pb2.JournalSnapshot()
+    snapshot.seq = seq
+    agents, tasks, frameworks = db.snapshot_state()
+    for framework in frameworks:
+        record = snapshot.records.add(seq=seq)
+        record.framework.CopyFrom(framework)
+    for task, submitted in tasks:
+        record = snapshot.records.add(seq=seq, submitted=submitted)
+        record.task.CopyFrom(task)
+    for agent in agents:
+        record = snapshot.records.add(seq=seq)
+        record.agent.CopyFrom(agent)
+        if 'seq' in db.agentsDict.get(agent.id, {}):
+            record.ack_seq = db.agentsDict[agent.id]['seq']
+    return snapshot
+
+class Journal:
+    def __init__(self, directory, snapshot_every=10000, flush_interval_ms=100):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.flush_interval_ms = flush_interval_ms
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()
+        self.seq = 0
+        self.since_snapshot = 0
+        self.segment = None
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _segments(self):
+        # (first seq, file name) of every segment, oldest first
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".log"):
+                segments.append((int(name[len("journal-"):-len(".log")]), name))
+        return sorted(segments)
+
+    def recover(self):
+        # rebuilds the saved state in the form db.restore() takes
+        agents = {}
+        agent_seqs = {}
+        tasks = {}
+        frameworks = {}
+        snapshot_seq = 0
+        if os.path.exists(self._path(SNAPSHOT)):
+            snapshot = messages_pb2.JournalSnapshot()
+            with open(self._path(SNAPSHOT), "rb") as f:
+                snapshot.ParseFromString(f.read())
+            snapshot_seq = snapshot.seq
+            for record in snapshot.records:
+                _apply(record, agents, agent_seqs, tasks, frameworks)
+
+        self.seq = snapshot_seq
+        replayed = 0
+        for first_seq, name in self._segments():
+            with open(self._path(name), "rb") as f:
+                for data in read_frames(f):
+                    record = messages_pb2.JournalRecord()
+                    record.ParseFromString(data)
+                    if record.seq <= snapshot_seq:
+                        continue
+                    _apply(record, agents, agent_seqs, tasks, frameworks)
+                    self.seq = record.seq
+                    replayed += 1
+        self.since_snapshot = replayed
+
+        task_list = sorted(tasks.values(), key=lambda pair: pair[1])
+        return list(agents.values()), task_list, list(frameworks.values()), agent_seqs, replayed
+
+    def open(self):
+        # new records always go to a new segment so a torn tail of an
+        # old one is never appended to. A segment already named after the
+        # next seq holds no complete record, so it is overwritten.
+        with self.lock:
+            self.segment = open(self._path(_segment_name(self.seq + 1)), "wb")
+
+    def on_change(self, table, key, message):
+        record = record_for(table, key, message)
+        with self.lock:
+            self.seq += 1
+            record.seq = self.seq
+            write_frame(self.segment, record)
+            self.since_snapshot += 1
+
+    def flush(self):
+        # fsync outside self.lock so appends never wait on the disk;
+        # snapshot_lock keeps the segment from being rotated meanwhile
+        with self.snapshot_lock:
+            with self.lock:
+                self.segment.flush()
+                segment = self.segment
+            os.fsync(segment.fileno())
+
+    def snapshot(self):
+        with self.snapshot_lock:
+            # start a new segment; everything before it is in the snapshot
+            with self.lock:
+                seq = self.seq
+                self.segment.flush()
+                os.fsync(self.segment.fileno())
+                self.segment.close()
+                self.segment = open(self._path(_segment_name(seq + 1)), "wb")
+                self.since_snapshot = 0
+
+            # read the state only after seq: it already holds every change
+            # up to seq, and replaying newer records over it is harmless
+            snapshot = build_snapshot(seq)
+
+            tmp = self._path(SNAPSHOT + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(snapshot.SerializeToString())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path(SNAPSHOT))
+
+            for first_seq, name in self._segments():
+                if first_seq <= seq:
+                    os.remove(self._path(name))
+            return seq
+
+    def _write(self):
+        while True:
+            time.sleep(self.flush_interval_ms / 1000)
+            try:
+                self.flush()
+                if self.since_snapshot >= self.snapshot_every:
+                    self.snapshot()
+            except Exception as e:
+                print("Journal error: " + str(e))
+
+    def start(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write, name="journal", daemon=True)
+            self.writer.start()
+
+    def close(self):
+        with self.snapshot_lock, self.lock:
+            self.segment.flush()
+            os.fsync(self.segment.fileno())
+            self.segment.close()
+
+def open_journal(directory, snapshot_every=10000, flush_interval_ms=100):
+    # restore the journaled state into db and journal every change from now on
+    journal = Journal(directory, snapshot_every, flush_interval_ms)
+    started = time.time()
+    agents, tasks, frameworks, agent_seqs, replayed = journal.recover()
+    db.restore(agents, tasks, frameworks, agent_seqs)
+    print("Restored " + str(len(agents)) + " agent(s), " + str(len(tasks)) + " task(s) and "
+          + str(len(frameworks)) + " framework(s) from " + directory + " (replayed "
+          + str(replayed) + " record(s)) in " + str(round((time.time() - started) * 1000)) + "ms")
+    journal.open()
+    db.change_listeners.append(journal.on_change)
+    journal.start()
+    return journal
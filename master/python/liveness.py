@@ -0,0 +1,81 @@
+import threading
+import time
+
+# A hashed timing wheel used to expire agents that stop pinging.
+#
+# Every key (agent_id) owns at most one entry in the wheel. A ping only
+# moves the key's deadline forward; the entry is re-hashed lazily when
+# its slot comes around, so both refreshing and expiring a key are
+# amortized O(1) no matter how many agents are registered.
+
+class TimerWheel:
+    def __init__(self, on_expire, tick_ms=100, num_slots=512):
+        self.on_expire = on_expire
+        self.tick_ms = tick_ms
+        self.num_slots = num_slots
+        self.slots = [set() for i in range(num_slots)]
+        self.deadlines = {}
+        self.current_tick = self._tick_of(time.time() * 1000)
+        self.lock = threading.Lock()
+        self.reaper = None
+
+    def _tick_of(self, ms):
+        return int(ms // self.tick_ms)
+
+    def schedule(self, key, deadline_ms):
+        with self.lock:
+            scheduled = key in self.deadlines
+            self.deadlines[key] = deadline_ms
+            if not scheduled:
+                #never hash into a tick that has already been swept
+                tick = max(self._tick_of(deadline_ms), self.current_tick)
+                self.slots[tick % self.num_slots].add(key)
+
+    def cancel(self, key):
+        #the slot entry is dropped lazily when its slot is swept
+        with self.lock:
+            self.deadlines.pop(key, None)
+
+    def advance(self, now_ms=None):
+        if now_ms is None:
+            now_ms = time.time() * 1000
+        target = self._tick_of(now_ms)
+        expired = []
+        with self.lock:
+            #a single revolution visits every slot, so skip any older ticks
+            if target - self.current_tick > self.num_slots:
+                self.current_tick = target - self.num_slots
+            while self.current_tick < target:
+                slot = self.slots[self.current_tick % self.num_slots]
+                for key in list(slot):
+                    deadline = self.deadlines.get(key)
+                    if deadline is None:
+                        slot.discard(key)
+                        continue
+                    tick = self._tick_of(deadline)
+                    if tick <= self.current_tick:
+                        slot.discard(key)
+                        del self.deadlines[key]
+                        expired.append(key)
+                    elif tick % self.num_slots != self.current_tick % self.num_slots:
+                        #deadline was pushed back by a ping, re-hash it
+                        slot.discard(key)
+                        self.slots[tick % self.num_slots].add(key)
+                self.current_tick += 1
+
+        for key in expired:
+            self.on_expire(key)
+        return expired
+
+    def _reap(self):
+        while True:
+            time.sleep(self.tick_ms / 1000)
+            try:
+                self.advance()
+            except Exception as e:
+                print("Reaper error: " + str(e))
+
+    def start(self):
+        if self.reaper is None:
+            self.reaper = threading.Thread(target=self._reap, name="reaper", daemon=True)
+            self.reaper.start()
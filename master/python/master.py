@@ -14,14 +14,13 @@ from coapthon.server.coap import CoAP
 from coapthon import defines
 from coapthon.resources.resource import Resource
 
-import messages_pb2
-
 import db
+import handlers
+import offers
 
 # TODO + NOTES:
 # Issue: What if the agent never pings to receive their task?
 # Issue: How do we ensure that the agent successfully started the task we assigned them?
-# Todo: De-register agent when they dont ping for a while
 # Todo: Keep track of available resources
 
 class BasicResource(Resource):
@@ -57,26 +56,7 @@ class RequestOfferResource(Resource):
         self.interface_type = "if1"
 
     def render_POST_advanced(self, request, response):
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.ParseFromString(request.payload)
-        framework_id = wrapper.request.framework_id
-
-        #first, clear any agents that have dropped off
-        db.clear_stale_agents()
-
-        #construct resource offer
-        print("\nGot resource offer request! Framework \"" + framework_id + "\"\n")
-        #currently just giving the framework everything we got
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.offermsg.framework_id = framework_id
-        for agent in db.get_all_agents():
-            offer = wrapper.offermsg.offers.add()
-            offer.id = db.get_offer_id()
-            offer.framework_id = framework_id
-            offer.agent_id = agent.id
-            offer.resources.extend(agent.resources)
-            offer.attributes.extend(agent.attributes)
-        response.payload = wrapper.SerializeToString()
+        response.payload = handlers.handle_offer_request(request.payload)
         response.code = defines.Codes.CHANGED.number
         response.content_type = defines.Content_types["application/octet-stream"]
         return self, response
@@ -91,29 +71,17 @@ class RunTaskResource(Resource):
         self.interface_type = "if1"
 
     def render_POST_advanced(self, request, response):
-        print("Received Task Request!")
-
-        # unpack request
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.ParseFromString(request.payload)
-
-        # print request (do nothing right now)
-        print("    Framework Name: " + wrapper.run_task.task.framework.name)
-        print("    Framework ID:   " + wrapper.run_task.task.framework.framework_id)
-        print("    Task Name:      " + wrapper.run_task.task.name)
-        print("    Task ID:        " + wrapper.run_task.task.task_id)
-        print("    Selected Agent: " + wrapper.run_task.task.agent_id)
-        for i in range(len(wrapper.run_task.task.resources)):
-            resource = wrapper.run_task.task.resources[i]
-            print("        Resource: (" + resource.name + ") type: " + str(resource.type) + " amt: " + str(resource.scalar).strip())
-
-        # TODO: Forward the request onto the particular device through a ping/pong
-        db.add_task(wrapper.run_task)
-
-        # construct response
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.pong.agent_id = "1234"
-        response.payload = wrapper.SerializeToString()
+        agent_id, payload, error = handlers.handle_run_task(request.payload)
+        if error:
+            response.payload = error
+            response.code = defines.Codes.FORBIDDEN.number
+            response.content_type = defines.Content_types["text/plain"]
+            return self, response
+        response.payload = payload
+
+        # push the task now if the agent is observing, otherwise it goes out on the next pong
+        self._coap_server.push_tasks(agent_id)
+
         response.code = defines.Codes.CHANGED.number
         response.content_type = defines.Content_types["application/octet-stream"]
         return self, response
@@ -129,51 +97,76 @@ class PingResource(Resource):
         self.interface_type = "if1"
 
     def render_POST_advanced(self, request, response):
-        #unpack request
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.ParseFromString(request.payload)
-
-        agent_id = wrapper.ping.agent.id
-        agent_name = wrapper.ping.agent.name
+        agent_id, payload = handlers.handle_ping(request.payload,
+                                                 self._coap_server.max_tasks_per_pong,
+                                                 self._coap_server.pong_byte_budget)
         if not agent_id:
             return self
-        print("Ping! Agent ID:(" + str(agent_id) + ") Name:(" + str(agent_name) + ")")
 
-        #refresh the agent timing
-        db.refresh_agent(agent_id, wrapper.ping.agent)
+        #let the agent observe its tasks instead of waiting for pongs
+        self._coap_server.add_push_resource(agent_id)
 
-        #update the state of any tasks it may have sent
-        db.refresh_tasks(wrapper.ping.tasks)
+        response.payload = payload
+        response.code = defines.Codes.CONTENT.number
+        # response.code = defines.Codes.CHANGED.number
+        response.content_type = defines.Content_types["application/octet-stream"]
+        return self, response
 
-        task_to_run = db.get_next_unissued_task_by_agent(agent_id)
+class AgentTaskResource(Resource):
+    # Observable resource at push/<agent_id>. An agent observing it gets
+    # a pong carrying its queued tasks as soon as they are submitted
+    # rather than on its next ping.
+    def __init__(self, agent_id, name="AgentTaskResource", coap_server=None):
+        super(AgentTaskResource, self).__init__(name, coap_server, visible=False,
+                                            observable=True, allow_children=False)
+        self.agent_id = agent_id
+        self.resource_type = "rt1"
+        self.content_type = "application/octet-stream"
+        self.interface_type = "if1"
 
-        # construct response
-        wrapper = messages_pb2.WrapperMessage()
-        wrapper.pong.agent_id = str(agent_id)
-        if task_to_run:
-            print("Got a task to schedule!!!")
-            wrapper.pong.run_task.task.CopyFrom(task_to_run)
-        response.payload = wrapper.SerializeToString()
+    def render_GET_advanced(self, request, response):
+        response.payload = handlers.render_push(self.agent_id, self._coap_server.max_tasks_per_pong,
+                                                self._coap_server.pong_byte_budget)
         response.code = defines.Codes.CONTENT.number
-        # response.code = defines.Codes.CHANGED.number
         response.content_type = defines.Content_types["application/octet-stream"]
         return self, response
 
 class CoAPServer(CoAP):
-    def __init__(self, host, port, multicast=False):
+    def __init__(self, host, port, multicast=False, max_tasks_per_pong=16, pong_byte_budget=1024):
         CoAP.__init__(self, (host, port), multicast)
+        self.max_tasks_per_pong = max_tasks_per_pong
+        self.pong_byte_budget = pong_byte_budget
+        self.push_resources = {}
         self.add_resource('basic/', BasicResource())
         # self.add_resource('register/', RegisterResource())
         self.add_resource('request/', RequestOfferResource())
-        self.add_resource('task/', RunTaskResource())
-        self.add_resource('ping/', PingResource())
+        self.add_resource('task/', RunTaskResource(coap_server=self))
+        self.add_resource('ping/', PingResource(coap_server=self))
+        self.add_resource('push/', Resource("PushResource", self, visible=True,
+                                            observable=False, allow_children=True))
 
         print ("CoAP Server start on " + host + ":" + str(port))
         print (self.root.dump())
 
-def start_coap_server(ip, port):  # pragma: no cover
+    def add_push_resource(self, agent_id):
+        if agent_id not in self.push_resources:
+            resource = AgentTaskResource(agent_id, coap_server=self)
+            self.add_resource('push/' + str(agent_id) + '/', resource)
+            self.push_resources[agent_id] = resource
+
+    def push_tasks(self, agent_id):
+        # notify the agent's observers, which renders its queued tasks.
+        # notify() only renders for registered observers, so with nobody
+        # observing the tasks wait for the agent's next ping.
+        resource = self.push_resources.get(agent_id)
+        if resource is None:
+            return
+        resource.observe_count += 1
+        self.notify(resource)
+
+def start_coap_server(ip, port, max_tasks_per_pong=16, pong_byte_budget=1024):  # pragma: no cover
     multicast = False
-    server = CoAPServer(ip, int(port), multicast)
+    server = CoAPServer(ip, int(port), multicast, max_tasks_per_pong, pong_byte_budget)
     try:
         server.listen(10)
     except:
@@ -183,18 +176,54 @@ def start_coap_server(ip, port):  # pragma: no cover
 
 
 ### This section is responsible for the api server
+def json_view_response(view):
+    # answers If-None-Match with a 304 when the view hasn't changed
+    etag, body = view
+    response = flask.Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(flask.request)
+
+def json_page_response(query):
+    # a filtered/paged listing; the next page's cursor is in X-Next-Cursor
+    try:
+        body, next_cursor = query(flask.request.args)
+    except ValueError as e:
+        return flask.Response(str(e), status=400)
+    response = flask.Response(body, mimetype='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
 @app.route('/agents', methods=['GET'])
 @app.route('/', methods=['GET'])
 def get_agents():
-    return flask.jsonify(list(db.get_all_agents_as_dict()))
+    if handlers.is_paged_query(flask.request.args):
+        return json_page_response(handlers.query_agents)
+    return json_view_response(db.get_agents_json())
 
 @app.route('/frameworks', methods=['GET'])
 def get_frameworks():
-    return flask.jsonify(list(db.get_all_frameworks_as_dict()))
+    return json_view_response(db.get_frameworks_json())
 
 @app.route('/tasks', methods=['GET'])
 def get_tasks():
-    return flask.jsonify(list(db.get_all_tasks_as_dict()))
+    if handlers.is_paged_query(flask.request.args):
+        return json_page_response(handlers.query_tasks)
+    return json_view_response(db.get_tasks_json())
+
+@app.route('/tasks/<task_id>', methods=['GET'])
+def get_task(task_id):
+    body = handlers.get_task(task_id)
+    if body is None:
+        return flask.Response("unknown task", status=404)
+    return flask.Response(body, mimetype='application/json')
+
+@app.route('/tasks/<task_id>/logs', methods=['GET'])
+def get_task_log(task_id):
+    status, body = handlers.get_task_log(task_id)
+    if status != 200:
+        return flask.Response(body, status=status)
+    return flask.Response(body, mimetype='application/octet-stream')
 
 def start_api_server(host, port):
     app.run(host=host,port=port)
@@ -207,11 +236,20 @@ if __name__ == "__main__":  # pragma: no cover
     parser.add_argument('--host', required=True, help='the LAN IP to bind to.')
     parser.add_argument('--port', required=False, default=5683, help='the local machine port to bind to.')
     parser.add_argument('--api-port', required=False, default=8080, help='the local machine port to bind to.')
+    handlers.add_master_args(parser)
     args = parser.parse_args()
+    store = handlers.configure_master(args)
 
     #start API server in a thread
     api_server_thread = threading.Thread(target=start_api_server,args=(args.host,args.api_port,), daemon = True)
     api_server_thread.start()
 
+    #expire agents that stop pinging, stale offers and old tasks in the background
+    db.start_reaper()
+    offers.start_expiry()
+
     #start coap server
-    start_coap_server(args.host, args.port)
+    start_coap_server(args.host, args.port, args.max_tasks_per_pong, args.pong_byte_budget)
+
+    if store is not None:
+        store.close()
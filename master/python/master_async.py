@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+
+import aiocoap
+import aiocoap.resource as resource
+from aiohttp import web
+
+import db
+import handlers
+import offers
+
+# An asyncio master. CoAP (aiocoap) and the HTTP API (aiohttp) are
+# served from a single event loop, so requests, the agent reaper and task
+# compaction are just loop tasks. The state db or journal writer and the
+# replication server still run threads of their own, so db.py keeps its
+# locks. It speaks the same protocol as master.py and can replace it.
+
+OCTET_STREAM = aiocoap.numbers.ContentFormat.OCTETSTREAM
+
+class RequestOfferResource(resource.Resource):
+    async def render_post(self, request):
+        payload = handlers.handle_offer_request(request.payload)
+        return aiocoap.Message(code=aiocoap.CHANGED, payload=payload, content_format=OCTET_STREAM)
+
+class RunTaskResource(resource.Resource):
+    def __init__(self, master):
+        super(RunTaskResource, self).__init__()
+        self.master = master
+
+    async def render_post(self, request):
+        agent_id, payload, error = handlers.handle_run_task(request.payload)
+        if error:
+            return aiocoap.Message(code=aiocoap.FORBIDDEN, payload=error.encode(),
+                                   content_format=aiocoap.numbers.ContentFormat.TEXT)
+
+        # push the task now if the agent is observing, otherwise it goes out on the next pong
+        self.master.push_tasks(agent_id)
+
+        return aiocoap.Message(code=aiocoap.CHANGED, payload=payload, content_format=OCTET_STREAM)
+
+class PingResource(resource.Resource):
+    def __init__(self, master):
+        super(PingResource, self).__init__()
+        self.master = master
+
+    async def render_post(self, request):
+        agent_id, payload = handlers.handle_ping(request.payload, self.master.max_tasks_per_pong,
+                                                 self.master.pong_byte_budget)
+        if not agent_id:
+            return aiocoap.Message(code=aiocoap.BAD_REQUEST)
+
+        #let the agent observe its tasks instead of waiting for pongs
+        self.master.add_push_resource(agent_id)
+
+        return aiocoap.Message(code=aiocoap.CONTENT, payload=payload, content_format=OCTET_STREAM)
+
+class AgentTaskResource(resource.ObservableResource):
+    # Observable resource at push/<agent_id>, see master.AgentTaskResource
+    def __init__(self, master, agent_id):
+        super(AgentTaskResource, self).__init__()
+        self.master = master
+        self.agent_id = agent_id
+
+    async def render_get(self, request):
+        payload = handlers.render_push(self.agent_id, self.master.max_tasks_per_pong,
+                                       self.master.pong_byte_budget)
+        return aiocoap.Message(code=aiocoap.CONTENT, payload=payload, content_format=OCTET_STREAM)
+
+class AsyncMaster:
+    def __init__(self, max_tasks_per_pong=16, pong_byte_budget=1024):
+        self.max_tasks_per_pong = max_tasks_per_pong
+        self.pong_byte_budget = pong_byte_budget
+        self.push_resources = {}
+        self.site = resource.Site()
+        self.site.add_resource(['.well-known', 'core'],
+                               resource.WKCResource(self.site.get_resources_as_linkheader))
+        self.site.add_resource(['request'], RequestOfferResource())
+        self.site.add_resource(['task'], RunTaskResource(self))
+        self.site.add_resource(['ping'], PingResource(self))
+
+    def add_push_resource(self, agent_id):
+        if agent_id not in self.push_resources:
+            push_resource = AgentTaskResource(self, agent_id)
+            self.site.add_resource(['push', str(agent_id)], push_resource)
+            self.push_resources[agent_id] = push_resource
+
+    def push_tasks(self, agent_id):
+        # re-renders the resource for each observer, if there are any
+        push_resource = self.push_resources.get(agent_id)
+        if push_resource is not None:
+            push_resource.updated_state()
+
+### This section is responsible for the api server
+def json_view_response(request, view):
+    # answers If-None-Match with a 304 when the view hasn't changed
+    etag, body = view
+    if request.if_none_match and any(match.value == etag for match in request.if_none_match):
+        response = web.Response(status=304)
+    else:
+        response = web.Response(text=body, content_type='application/json')
+    response.etag = etag
+    return response
+
+def json_page_response(request, query):
+    # a filtered/paged listing; the next page's cursor is in X-Next-Cursor
+    try:
+        body, next_cursor = query(request.query)
+    except ValueError as e:
+        return web.Response(text=str(e), status=400)
+    response = web.Response(text=body, content_type='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
+
+async def get_agents(request):
+    if handlers.is_paged_query(request.query):
+        return json_page_response(request, handlers.query_agents)
+    return json_view_response(request, db.get_agents_json())
+
+async def get_frameworks(request):
+    return json_view_response(request, db.get_frameworks_json())
+
+async def get_tasks(request):
+    if handlers.is_paged_query(request.query):
+        return json_page_response(request, handlers.query_tasks)
+    return json_view_response(request, db.get_tasks_json())
+
+async def get_task(request):
+    body = handlers.get_task(request.match_info['task_id'])
+    if body is None:
+        return web.Response(text="unknown task", status=404)
+    return web.Response(text=body, content_type='application/json')
+
+async def get_task_log(request):
+    status, body = handlers.get_task_log(request.match_info['task_id'])
+    if status != 200:
+        return web.Response(text=body, status=status)
+    return web.Response(body=body, content_type='application/octet-stream')
+
+def make_api_app():
+    app = web.Application()
+    app.router.add_get('/', get_agents)
+    app.router.add_get('/agents', get_agents)
+    app.router.add_get('/frameworks', get_frameworks)
+    app.router.add_get('/tasks', get_tasks)
+    app.router.add_get('/tasks/{task_id}', get_task)
+    app.router.add_get('/tasks/{task_id}/logs', get_task_log)
+    return app
+
+async def reap_agents():
+    # drive the agent and offer timer wheels from the loop instead of threads
+    while True:
+        await asyncio.sleep(db.agent_timer.tick_ms / 1000)
+        db.clear_stale_agents()
+        offers.expire_offers()
+
+async def compact_tasks():
+    # archive finished tasks past their retention
+    while True:
+        await asyncio.sleep(1)
+        db.compact_tasks()
+
+async def serve(host, port, api_port, max_tasks_per_pong=16, pong_byte_budget=1024):
+    master = AsyncMaster(max_tasks_per_pong, pong_byte_budget)
+    coap_context = await aiocoap.Context.create_server_context(master.site, bind=(host, int(port)))
+    print("CoAP Server start on " + host + ":" + str(port))
+
+    runner = web.AppRunner(make_api_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, int(api_port)).start()
+    print("API Server start on " + host + ":" + str(api_port))
+
+    reaper = asyncio.ensure_future(reap_agents())
+    compactor = asyncio.ensure_future(compact_tasks())
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        reaper.cancel()
+        compactor.cancel()
+        await runner.cleanup()
+        await coap_context.shutdown()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description='Launch the asyncio CoAP Resource Manager Master')
+    parser.add_argument('--host', required=True, help='the LAN IP to bind to.')
+    parser.add_argument('--port', required=False, default=5683, help='the local machine port to bind to.')
+    parser.add_argument('--api-port', required=False, default=8080, help='the local machine port to bind to.')
+    handlers.add_master_args(parser)
+    args = parser.parse_args()
+    store = handlers.configure_master(args)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.api_port, args.max_tasks_per_pong, args.pong_byte_budget))
+    except KeyboardInterrupt:
+        print("Server Shutdown")
+    finally:
+        if store is not None:
+            store.close()
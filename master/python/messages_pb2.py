@@ -18,7 +18,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='',
   syntax='proto2',
   serialized_options=None,
-  serialized_pb=b'\n\x0emessages.proto\"\xd9\x01\n\x0eWrapperMessage\x12!\n\x04ping\x18\x02 \x01(\x0b\x32\x11.PingAgentMessageH\x00\x12!\n\x04pong\x18\x03 \x01(\x0b\x32\x11.PongAgentMessageH\x00\x12#\n\x08run_task\x18\x04 \x01(\x0b\x32\x0f.RunTaskMessageH\x00\x12)\n\x08offermsg\x18\x05 \x01(\x0b\x32\x15.ResourceOfferMessageH\x00\x12*\n\x07request\x18\x06 \x01(\x0b\x32\x17.ResourceRequestMessageH\x00\x42\x05\n\x03msg\"G\n\x10PingAgentMessage\x12\x19\n\x05\x61gent\x18\x01 \x02(\x0b\x32\n.AgentInfo\x12\x18\n\x05tasks\x18\x02 \x03(\x0b\x32\t.TaskInfo\"G\n\x10PongAgentMessage\x12\x10\n\x08\x61gent_id\x18\x01 \x02(\t\x12!\n\x08run_task\x18\x02 \x01(\x0b\x32\x0f.RunTaskMessage\"v\n\tAgentInfo\x12\x1c\n\tresources\x18\x01 \x03(\x0b\x32\t.Resource\x12\x1e\n\nattributes\x18\x02 \x03(\x0b\x32\n.Attribute\x12\n\n\x02id\x18\x03 \x01(\t\x12\x0c\n\x04name\x18\x04 \x01(\t\x12\x11\n\tping_rate\x18\x05 \x01(\x05\"\xd4\x01\n\x08Resource\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x19\n\x04type\x18\x02 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x03 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x04 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x05 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x07 \x01(\x0b\x32\x0b.Value.Text\x12\x1d\n\x06\x64\x65vice\x18\x08 \x01(\x0b\x32\r.Value.Device\x12\x0e\n\x06shared\x18\x06 \x01(\x08\"\xa6\x01\n\tAttribute\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x19\n\x04type\x18\x02 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x03 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x04 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x06 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x05 \x01(\x0b\x32\x0b.Value.Text\"\x9d\x03\n\x05Value\x12\x19\n\x04type\x18\x01 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x02 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x03 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x04 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x05 \x01(\x0b\x32\x0b.Value.Text\x12\x1d\n\x06\x64\x65vice\x18\x06 \x01(\x0b\x32\r.Value.Device\x1a\x17\n\x06Scalar\x12\r\n\x05value\x18\x01 \x02(\x01\x1a#\n\x05Range\x12\r\n\x05\x62\x65gin\x18\x01 \x02(\x04\x12\x0b\n\x03\x65nd\x18\x02 \x02(\x04\x1a%\n\x06Ranges\x12\x1b\n\x05range\x18\x01 \x03(\x0b\x32\x0c.Value.Range\x1a\x13\n\x03Set\x12\x0c\n\x04item\x18\x01 \x03(\t\x1a\x15\n\x04Text\x12\r\n\x05value\x18\x01 \x02(\t\x1a\x18\n\x06\x44\x65vice\x12\x0e\n\x06\x64\x65vice\x18\x01 \x02(\t\"=\n\x04Type\x12\n\n\x06SCALAR\x10\x00\x12\n\n\x06RANGES\x10\x01\x12\x07\n\x03SET\x10\x02\x12\x08\n\x04TEXT\x10\x03\x12\n\n\x06\x44\x45VICE\x10\x04\"\x8d\x04\n\rContainerInfo\x12!\n\x04type\x18\x01 \x02(\x0e\x32\x13.ContainerInfo.Type\x12)\n\x06\x64ocker\x18\x03 \x01(\x0b\x32\x19.ContainerInfo.DockerInfo\x12%\n\x04wasm\x18\x05 \x01(\x0b\x32\x17.ContainerInfo.WASMInfo\x1a\xcd\x02\n\nDockerInfo\x12\r\n\x05image\x18\x01 \x02(\t\x12\x38\n\x07network\x18\x02 \x01(\x0e\x32!.ContainerInfo.DockerInfo.Network:\x04HOST\x12<\n\rport_mappings\x18\x03 \x03(\x0b\x32%.ContainerInfo.DockerInfo.PortMapping\x12\x18\n\x10\x66orce_pull_image\x18\x06 \x01(\x08\x12\x1d\n\x15\x65nvironment_variables\x18\x07 \x03(\t\x1aJ\n\x0bPortMapping\x12\x11\n\thost_port\x18\x01 \x02(\r\x12\x16\n\x0e\x63ontainer_port\x18\x02 \x02(\r\x12\x10\n\x08protocol\x18\x03 \x01(\t\"3\n\x07Network\x12\x08\n\x04HOST\x10\x01\x12\n\n\x06\x42RIDGE\x10\x02\x12\x08\n\x04NONE\x10\x03\x12\x08\n\x04USER\x10\x04\x1a\x19\n\x08WASMInfo\x12\r\n\x05\x65mpty\x18\x01 \x02(\t\"\x1c\n\x04Type\x12\n\n\x06\x44OCKER\x10\x01\x12\x08\n\x04WASM\x10\x02\"3\n\rFrameworkInfo\x12\x0c\n\x04name\x18\x02 \x02(\t\x12\x14\n\x0c\x66ramework_id\x18\x03 \x01(\t\"\xc4\x02\n\x08TaskInfo\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x0f\n\x07task_id\x18\x02 \x02(\t\x12\x10\n\x08\x61gent_id\x18\x03 \x02(\t\x12\x1c\n\tresources\x18\x04 \x03(\x0b\x32\t.Resource\x12!\n\tframework\x18\x05 \x02(\x0b\x32\x0e.FrameworkInfo\x12!\n\tcontainer\x18\t \x02(\x0b\x32\x0e.ContainerInfo\x12\"\n\x05state\x18\x06 \x01(\x0e\x32\x13.TaskInfo.TaskState\x12\x15\n\rerror_message\x18\x07 \x01(\t\"h\n\tTaskState\x12\r\n\tCOMPLETED\x10\x00\x12\x0b\n\x07\x45RRORED\x10\x01\x12\x0b\n\x07RUNNING\x10\x02\x12\n\n\x06ISSUED\x10\x03\x12\x0c\n\x08UNISSUED\x10\x04\x12\x0c\n\x08STARTING\x10\x05\x12\n\n\x06KILLED\x10\x06\")\n\x0eRunTaskMessage\x12\x17\n\x04task\x18\x04 \x02(\x0b\x32\t.TaskInfo\".\n\x16ResourceRequestMessage\x12\x14\n\x0c\x66ramework_id\x18\x01 \x02(\t\"D\n\x14ResourceOfferMessage\x12\x14\n\x0c\x66ramework_id\x18\x01 \x02(\t\x12\x16\n\x06offers\x18\x02 \x03(\x0b\x32\x06.Offer\"y\n\x05Offer\x12\n\n\x02id\x18\x01 \x02(\t\x12\x14\n\x0c\x66ramework_id\x18\x02 \x02(\t\x12\x10\n\x08\x61gent_id\x18\x03 \x02(\t\x12\x1c\n\tresources\x18\x05 \x03(\x0b\x32\t.Resource\x12\x1e\n\nattributes\x18\x07 \x03(\x0b\x32\n.Attribute\"\x18\n\x07OfferID\x12\r\n\x05value\x18\x01 \x02(\t'
+  serialized_pb=b'\n\x0emessages.proto\"\xd9\x01\n\x0eWrapperMessage\x12!\n\x04ping\x18\x02 \x01(\x0b\x32\x11.PingAgentMessageH\x00\x12!\n\x04pong\x18\x03 \x01(\x0b\x32\x11.PongAgentMessageH\x00\x12#\n\x08run_task\x18\x04 \x01(\x0b\x32\x0f.RunTaskMessageH\x00\x12)\n\x08offermsg\x18\x05 \x01(\x0b\x32\x15.ResourceOfferMessageH\x00\x12*\n\x07request\x18\x06 \x01(\x0b\x32\x17.ResourceRequestMessageH\x00\x42\x05\n\x03msg\"\x90\x01\n\x10PingAgentMessage\x12\x19\n\x05\x61gent\x18\x01 \x02(\x0b\x32\n.AgentInfo\x12\x18\n\x05tasks\x18\x02 \x03(\x0b\x32\t.TaskInfo\x12\x0b\n\x03seq\x18\x03 \x01(\r\x12\x0f\n\x07\x61\x63k_seq\x18\x04 \x01(\r\x12\x11\n\tfull_sync\x18\x05 \x01(\x08\x12\x16\n\x04logs\x18\x06 \x03(\x0b\x32\x08.TaskLog\"8\n\x07TaskLog\x12\x0f\n\x07task_id\x18\x01 \x02(\t\x12\x0e\n\x06\x64igest\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"\xb3\x01\n\x10PongAgentMessage\x12\x10\n\x08\x61gent_id\x18\x01 \x02(\t\x12!\n\x08run_task\x18\x02 \x01(\x0b\x32\x0f.RunTaskMessage\x12\x0f\n\x07\x61\x63k_seq\x18\x03 \x01(\r\x12\x0e\n\x06resync\x18\x04 \x01(\x08\x12\"\n\trun_tasks\x18\x05 \x03(\x0b\x32\x0f.RunTaskMessage\x12\x12\n\nfetch_logs\x18\x06 \x03(\t\x12\x11\n\tmaster_id\x18\x07 \x01(\t\"v\n\tAgentInfo\x12\x1c\n\tresources\x18\x01 \x03(\x0b\x32\t.Resource\x12\x1e\n\nattributes\x18\x02 \x03(\x0b\x32\n.Attribute\x12\n\n\x02id\x18\x03 \x01(\t\x12\x0c\n\x04name\x18\x04 \x01(\t\x12\x11\n\tping_rate\x18\x05 \x01(\x05\"\xd4\x01\n\x08Resource\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x19\n\x04type\x18\x02 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x03 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x04 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x05 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x07 \x01(\x0b\x32\x0b.Value.Text\x12\x1d\n\x06\x64\x65vice\x18\x08 \x01(\x0b\x32\r.Value.Device\x12\x0e\n\x06shared\x18\x06 \x01(\x08\"\xa6\x01\n\tAttribute\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x19\n\x04type\x18\x02 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x03 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x04 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x06 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x05 \x01(\x0b\x32\x0b.Value.Text\"\x9d\x03\n\x05Value\x12\x19\n\x04type\x18\x01 \x02(\x0e\x32\x0b.Value.Type\x12\x1d\n\x06scalar\x18\x02 \x01(\x0b\x32\r.Value.Scalar\x12\x1d\n\x06ranges\x18\x03 \x01(\x0b\x32\r.Value.Ranges\x12\x17\n\x03set\x18\x04 \x01(\x0b\x32\n.Value.Set\x12\x19\n\x04text\x18\x05 \x01(\x0b\x32\x0b.Value.Text\x12\x1d\n\x06\x64\x65vice\x18\x06 \x01(\x0b\x32\r.Value.Device\x1a\x17\n\x06Scalar\x12\r\n\x05value\x18\x01 \x02(\x01\x1a#\n\x05Range\x12\r\n\x05\x62\x65gin\x18\x01 \x02(\x04\x12\x0b\n\x03\x65nd\x18\x02 \x02(\x04\x1a%\n\x06Ranges\x12\x1b\n\x05range\x18\x01 \x03(\x0b\x32\x0c.Value.Range\x1a\x13\n\x03Set\x12\x0c\n\x04item\x18\x01 \x03(\t\x1a\x15\n\x04Text\x12\r\n\x05value\x18\x01 \x02(\t\x1a\x18\n\x06\x44\x65vice\x12\x0e\n\x06\x64\x65vice\x18\x01 \x02(\t\"=\n\x04Type\x12\n\n\x06SCALAR\x10\x00\x12\n\n\x06RANGES\x10\x01\x12\x07\n\x03SET\x10\x02\x12\x08\n\x04TEXT\x10\x03\x12\n\n\x06\x44\x45VICE\x10\x04\"\x8d\x04\n\rContainerInfo\x12!\n\x04type\x18\x01 \x02(\x0e\x32\x13.ContainerInfo.Type\x12)\n\x06\x64ocker\x18\x03 \x01(\x0b\x32\x19.ContainerInfo.DockerInfo\x12%\n\x04wasm\x18\x05 \x01(\x0b\x32\x17.ContainerInfo.WASMInfo\x1a\xcd\x02\n\nDockerInfo\x12\r\n\x05image\x18\x01 \x02(\t\x12\x38\n\x07network\x18\x02 \x01(\x0e\x32!.ContainerInfo.DockerInfo.Network:\x04HOST\x12<\n\rport_mappings\x18\x03 \x03(\x0b\x32%.ContainerInfo.DockerInfo.PortMapping\x12\x18\n\x10\x66orce_pull_image\x18\x06 \x01(\x08\x12\x1d\n\x15\x65nvironment_variables\x18\x07 \x03(\t\x1aJ\n\x0bPortMapping\x12\x11\n\thost_port\x18\x01 \x02(\r\x12\x16\n\x0e\x63ontainer_port\x18\x02 \x02(\r\x12\x10\n\x08protocol\x18\x03 \x01(\t\"3\n\x07Network\x12\x08\n\x04HOST\x10\x01\x12\n\n\x06\x42RIDGE\x10\x02\x12\x08\n\x04NONE\x10\x03\x12\x08\n\x04USER\x10\x04\x1a\x19\n\x08WASMInfo\x12\r\n\x05\x65mpty\x18\x01 \x02(\t\"\x1c\n\x04Type\x12\n\n\x06\x44OCKER\x10\x01\x12\x08\n\x04WASM\x10\x02\"A\n\rFrameworkInfo\x12\x0c\n\x04name\x18\x02 \x02(\t\x12\x14\n\x0c\x66ramework_id\x18\x03 \x01(\t\x12\x0c\n\x04role\x18\x04 \x01(\t\"\xf4\x02\n\x08TaskInfo\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x0f\n\x07task_id\x18\x02 \x02(\t\x12\x10\n\x08\x61gent_id\x18\x03 \x02(\t\x12\x1c\n\tresources\x18\x04 \x03(\x0b\x32\t.Resource\x12!\n\tframework\x18\x05 \x02(\x0b\x32\x0e.FrameworkInfo\x12!\n\tcontainer\x18\t \x02(\x0b\x32\x0e.ContainerInfo\x12\"\n\x05state\x18\x06 \x01(\x0e\x32\x13.TaskInfo.TaskState\x12\x15\n\rerror_message\x18\x07 \x01(\t\x12\x12\n\nlog_digest\x18\x08 \x01(\t\x12\x10\n\x08log_size\x18\n \x01(\x04\"r\n\tTaskState\x12\r\n\tCOMPLETED\x10\x00\x12\x0b\n\x07\x45RRORED\x10\x01\x12\x0b\n\x07RUNNING\x10\x02\x12\n\n\x06ISSUED\x10\x03\x12\x0c\n\x08UNISSUED\x10\x04\x12\x0c\n\x08STARTING\x10\x05\x12\n\n\x06KILLED\x10\x06\x12\x08\n\x04LOST\x10\x07\";\n\x0eRunTaskMessage\x12\x17\n\x04task\x18\x04 \x02(\x0b\x32\t.TaskInfo\x12\x10\n\x08offer_id\x18\x05 \x01(\t\"\xb6\x01\n\x16ResourceRequestMessage\x12\x14\n\x0c\x66ramework_id\x18\x01 \x02(\t\x12\x0c\n\x04role\x18\x02 \x01(\t\x12 \n\rmin_resources\x18\x03 \x03(\x0b\x32\t.Resource\x12\x1e\n\nattributes\x18\x04 \x03(\x0b\x32\n.Attribute\x12\x12\n\nmax_offers\x18\x05 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x06 \x01(\t\x12\x12\n\npage_bytes\x18\x07 \x01(\r\"Y\n\x14ResourceOfferMessage\x12\x14\n\x0c\x66ramework_id\x18\x01 \x02(\t\x12\x16\n\x06offers\x18\x02 \x03(\x0b\x32\x06.Offer\x12\x13\n\x0bnext_cursor\x18\x03 \x01(\t\"y\n\x05Offer\x12\n\n\x02id\x18\x01 \x02(\t\x12\x14\n\x0c\x66ramework_id\x18\x02 \x02(\t\x12\x10\n\x08\x61gent_id\x18\x03 \x02(\t\x12\x1c\n\tresources\x18\x05 \x03(\x0b\x32\t.Resource\x12\x1e\n\nattributes\x18\x07 \x03(\x0b\x32\n.Attribute\"\x18\n\x07OfferID\x12\r\n\x05value\x18\x01 \x02(\t\"\xde\x01\n\rJournalRecord\x12\x0b\n\x03seq\x18\x01 \x02(\x04\x12\x1b\n\x05\x61gent\x18\x02 \x01(\x0b\x32\n.AgentInfoH\x00\x12\x19\n\x04task\x18\x03 \x01(\x0b\x32\t.TaskInfoH\x00\x12#\n\tframework\x18\x04 \x01(\x0b\x32\x0e.FrameworkInfoH\x00\x12\x1a\n\x10removed_agent_id\x18\x05 \x01(\tH\x00\x12\x19\n\x0fremoved_task_id\x18\x06 \x01(\tH\x00\x12\x11\n\tsubmitted\x18\x07 \x01(\x01\x12\x0f\n\x07\x61\x63k_seq\x18\x08 \x01(\rB\x08\n\x06\x63hange\"?\n\x0fJournalSnapshot\x12\x0b\n\x03seq\x18\x01 \x02(\x04\x12\x1f\n\x07records\x18\x02 \x03(\x0b\x32\x0e.JournalRecord'
 )
 
 
@@ -52,8 +52,8 @@ _VALUE_TYPE = _descriptor.EnumDescriptor(
   ],
   containing_type=None,
   serialized_options=None,
-  serialized_start=1241,
-  serialized_end=1302,
+  serialized_start=1482,
+  serialized_end=1543,
 )
 _sym_db.RegisterEnumDescriptor(_VALUE_TYPE)
 
@@ -82,8 +82,8 @@ _CONTAINERINFO_DOCKERINFO_NETWORK = _descriptor.EnumDescriptor(
   ],
   containing_type=None,
   serialized_options=None,
-  serialized_start=1722,
-  serialized_end=1773,
+  serialized_start=1963,
+  serialized_end=2014,
 )
 _sym_db.RegisterEnumDescriptor(_CONTAINERINFO_DOCKERINFO_NETWORK)
 
@@ -104,8 +104,8 @@ _CONTAINERINFO_TYPE = _descriptor.EnumDescriptor(
   ],
   containing_type=None,
   serialized_options=None,
-  serialized_start=1802,
-  serialized_end=1830,
+  serialized_start=2043,
+  serialized_end=2071,
 )
 _sym_db.RegisterEnumDescriptor(_CONTAINERINFO_TYPE)
 
@@ -143,11 +143,15 @@ _TASKINFO_TASKSTATE = _descriptor.EnumDescriptor(
       name='KILLED', index=6, number=6,
       serialized_options=None,
       type=None),
+    _descriptor.EnumValueDescriptor(
+      name='LOST', index=7, number=7,
+      serialized_options=None,
+      type=None),
   ],
   containing_type=None,
   serialized_options=None,
-  serialized_start=2106,
-  serialized_end=2210,
+  serialized_start=2399,
+  serialized_end=2513,
 )
 _sym_db.RegisterEnumDescriptor(_TASKINFO_TASKSTATE)
 
@@ -235,6 +239,79 @@ _PINGAGENTMESSAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='seq', full_name='PingAgentMessage.seq', index=2,
+      number=3, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ack_seq', full_name='PingAgentMessage.ack_seq', index=3,
+      number=4, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='full_sync', full_name='PingAgentMessage.full_sync', index=4,
+      number=5, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='logs', full_name='PingAgentMessage.logs', index=5,
+      number=6, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto2',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=239,
+  serialized_end=383,
+)
+
+
+_TASKLOG = _descriptor.Descriptor(
+  name='TaskLog',
+  full_name='TaskLog',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='task_id', full_name='TaskLog.task_id', index=0,
+      number=1, type=9, cpp_type=9, label=2,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='digest', full_name='TaskLog.digest', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='data', full_name='TaskLog.data', index=2,
+      number=3, type=12, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"",
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -247,8 +324,8 @@ _PINGAGENTMESSAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=238,
-  serialized_end=309,
+  serialized_start=385,
+  serialized_end=441,
 )
 
 
@@ -273,6 +350,41 @@ _PONGAGENTMESSAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ack_seq', full_name='PongAgentMessage.ack_seq', index=2,
+      number=3, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='resync', full_name='PongAgentMessage.resync', index=3,
+      number=4, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='run_tasks', full_name='PongAgentMessage.run_tasks', index=4,
+      number=5, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='fetch_logs', full_name='PongAgentMessage.fetch_logs', index=5,
+      number=6, type=9, cpp_type=9, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='master_id', full_name='PongAgentMessage.master_id', index=6,
+      number=7, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -285,8 +397,8 @@ _PONGAGENTMESSAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=311,
-  serialized_end=382,
+  serialized_start=444,
+  serialized_end=623,
 )
 
 
@@ -344,8 +456,8 @@ _AGENTINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=384,
-  serialized_end=502,
+  serialized_start=625,
+  serialized_end=743,
 )
 
 
@@ -424,8 +536,8 @@ _RESOURCE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=505,
-  serialized_end=717,
+  serialized_start=746,
+  serialized_end=958,
 )
 
 
@@ -490,8 +602,8 @@ _ATTRIBUTE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=720,
-  serialized_end=886,
+  serialized_start=961,
+  serialized_end=1127,
 )
 
 
@@ -521,8 +633,8 @@ _VALUE_SCALAR = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1070,
-  serialized_end=1093,
+  serialized_start=1311,
+  serialized_end=1334,
 )
 
 _VALUE_RANGE = _descriptor.Descriptor(
@@ -558,8 +670,8 @@ _VALUE_RANGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1095,
-  serialized_end=1130,
+  serialized_start=1336,
+  serialized_end=1371,
 )
 
 _VALUE_RANGES = _descriptor.Descriptor(
@@ -588,8 +700,8 @@ _VALUE_RANGES = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1132,
-  serialized_end=1169,
+  serialized_start=1373,
+  serialized_end=1410,
 )
 
 _VALUE_SET = _descriptor.Descriptor(
@@ -618,8 +730,8 @@ _VALUE_SET = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1171,
-  serialized_end=1190,
+  serialized_start=1412,
+  serialized_end=1431,
 )
 
 _VALUE_TEXT = _descriptor.Descriptor(
@@ -648,8 +760,8 @@ _VALUE_TEXT = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1192,
-  serialized_end=1213,
+  serialized_start=1433,
+  serialized_end=1454,
 )
 
 _VALUE_DEVICE = _descriptor.Descriptor(
@@ -678,8 +790,8 @@ _VALUE_DEVICE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1215,
-  serialized_end=1239,
+  serialized_start=1456,
+  serialized_end=1480,
 )
 
 _VALUE = _descriptor.Descriptor(
@@ -744,8 +856,8 @@ _VALUE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=889,
-  serialized_end=1302,
+  serialized_start=1130,
+  serialized_end=1543,
 )
 
 
@@ -789,8 +901,8 @@ _CONTAINERINFO_DOCKERINFO_PORTMAPPING = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1646,
-  serialized_end=1720,
+  serialized_start=1887,
+  serialized_end=1961,
 )
 
 _CONTAINERINFO_DOCKERINFO = _descriptor.Descriptor(
@@ -848,8 +960,8 @@ _CONTAINERINFO_DOCKERINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1440,
-  serialized_end=1773,
+  serialized_start=1681,
+  serialized_end=2014,
 )
 
 _CONTAINERINFO_WASMINFO = _descriptor.Descriptor(
@@ -878,8 +990,8 @@ _CONTAINERINFO_WASMINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1775,
-  serialized_end=1800,
+  serialized_start=2016,
+  serialized_end=2041,
 )
 
 _CONTAINERINFO = _descriptor.Descriptor(
@@ -923,8 +1035,8 @@ _CONTAINERINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1305,
-  serialized_end=1830,
+  serialized_start=1546,
+  serialized_end=2071,
 )
 
 
@@ -949,6 +1061,13 @@ _FRAMEWORKINFO = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='role', full_name='FrameworkInfo.role', index=2,
+      number=4, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -961,8 +1080,8 @@ _FRAMEWORKINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1832,
-  serialized_end=1883,
+  serialized_start=2073,
+  serialized_end=2138,
 )
 
 
@@ -1029,6 +1148,20 @@ _TASKINFO = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='log_digest', full_name='TaskInfo.log_digest', index=8,
+      number=8, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='log_size', full_name='TaskInfo.log_size', index=9,
+      number=10, type=4, cpp_type=4, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -1042,8 +1175,8 @@ _TASKINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1886,
-  serialized_end=2210,
+  serialized_start=2141,
+  serialized_end=2513,
 )
 
 
@@ -1061,6 +1194,13 @@ _RUNTASKMESSAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='offer_id', full_name='RunTaskMessage.offer_id', index=1,
+      number=5, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -1073,8 +1213,8 @@ _RUNTASKMESSAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=2212,
-  serialized_end=2253,
+  serialized_start=2515,
+  serialized_end=2574,
 )
 
 
@@ -1092,6 +1232,48 @@ _RESOURCEREQUESTMESSAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='role', full_name='ResourceRequestMessage.role', index=1,
+      number=2, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='min_resources', full_name='ResourceRequestMessage.min_resources', index=2,
+      number=3, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='attributes', full_name='ResourceRequestMessage.attributes', index=3,
+      number=4, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='max_offers', full_name='ResourceRequestMessage.max_offers', index=4,
+      number=5, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='cursor', full_name='ResourceRequestMessage.cursor', index=5,
+      number=6, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='page_bytes', full_name='ResourceRequestMessage.page_bytes', index=6,
+      number=7, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -1104,8 +1286,8 @@ _RESOURCEREQUESTMESSAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=2255,
-  serialized_end=2301,
+  serialized_start=2577,
+  serialized_end=2759,
 )
 
 
@@ -1130,6 +1312,13 @@ _RESOURCEOFFERMESSAGE = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='next_cursor', full_name='ResourceOfferMessage.next_cursor', index=2,
+      number=3, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -1142,8 +1331,8 @@ _RESOURCEOFFERMESSAGE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=2303,
-  serialized_end=2371,
+  serialized_start=2761,
+  serialized_end=2850,
 )
 
 
@@ -1201,8 +1390,8 @@ _OFFER = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=2373,
-  serialized_end=2494,
+  serialized_start=2852,
+  serialized_end=2973,
 )
 
 
@@ -1232,8 +1421,129 @@ _OFFERID = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=2496,
-  serialized_end=2520,
+  serialized_start=2975,
+  serialized_end=2999,
+)
+
+
+_JOURNALRECORD = _descriptor.Descriptor(
+  name='JournalRecord',
+  full_name='JournalRecord',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='seq', full_name='JournalRecord.seq', index=0,
+      number=1, type=4, cpp_type=4, label=2,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='agent', full_name='JournalRecord.agent', index=1,
+      number=2, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='task', full_name='JournalRecord.task', index=2,
+      number=3, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='framework', full_name='JournalRecord.framework', index=3,
+      number=4, type=11, cpp_type=10, label=1,
+      has_default_value=False, default_value=None,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='removed_agent_id', full_name='JournalRecord.removed_agent_id', index=4,
+      number=5, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='removed_task_id', full_name='JournalRecord.removed_task_id', index=5,
+      number=6, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=b"".decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='submitted', full_name='JournalRecord.submitted', index=6,
+      number=7, type=1, cpp_type=5, label=1,
+      has_default_value=False, default_value=float(0),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='ack_seq', full_name='JournalRecord.ack_seq', index=7,
+      number=8, type=13, cpp_type=3, label=1,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto2',
+  extension_ranges=[],
+  oneofs=[
+    _descriptor.OneofDescriptor(
+      name='change', full_name='JournalRecord.change',
+      index=0, containing_type=None, fields=[]),
+  ],
+  serialized_start=3002,
+  serialized_end=3224,
+)
+
+
+_JOURNALSNAPSHOT = _descriptor.Descriptor(
+  name='JournalSnapshot',
+  full_name='JournalSnapshot',
+  filename=None,
+  file=DESCRIPTOR,
+  containing_type=None,
+  fields=[
+    _descriptor.FieldDescriptor(
+      name='seq', full_name='JournalSnapshot.seq', index=0,
+      number=1, type=4, cpp_type=4, label=2,
+      has_default_value=False, default_value=0,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='records', full_name='JournalSnapshot.records', index=1,
+      number=2, type=11, cpp_type=10, label=3,
+      has_default_value=False, default_value=[],
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
+  ],
+  extensions=[
+  ],
+  nested_types=[],
+  enum_types=[
+  ],
+  serialized_options=None,
+  is_extendable=False,
+  syntax='proto2',
+  extension_ranges=[],
+  oneofs=[
+  ],
+  serialized_start=3226,
+  serialized_end=3289,
 )
 
 _WRAPPERMESSAGE.fields_by_name['ping'].message_type = _PINGAGENTMESSAGE
@@ -1258,7 +1568,9 @@ _WRAPPERMESSAGE.oneofs_by_name['msg'].fields.append(
 _WRAPPERMESSAGE.fields_by_name['request'].containing_oneof = _WRAPPERMESSAGE.oneofs_by_name['msg']
 _PINGAGENTMESSAGE.fields_by_name['agent'].message_type = _AGENTINFO
 _PINGAGENTMESSAGE.fields_by_name['tasks'].message_type = _TASKINFO
+_PINGAGENTMESSAGE.fields_by_name['logs'].message_type = _TASKLOG
 _PONGAGENTMESSAGE.fields_by_name['run_task'].message_type = _RUNTASKMESSAGE
+_PONGAGENTMESSAGE.fields_by_name['run_tasks'].message_type = _RUNTASKMESSAGE
 _AGENTINFO.fields_by_name['resources'].message_type = _RESOURCE
 _AGENTINFO.fields_by_name['attributes'].message_type = _ATTRIBUTE
 _RESOURCE.fields_by_name['type'].enum_type = _VALUE_TYPE
@@ -1302,11 +1614,33 @@ _TASKINFO.fields_by_name['container'].message_type = _CONTAINERINFO
 _TASKINFO.fields_by_name['state'].enum_type = _TASKINFO_TASKSTATE
 _TASKINFO_TASKSTATE.containing_type = _TASKINFO
 _RUNTASKMESSAGE.fields_by_name['task'].message_type = _TASKINFO
+_RESOURCEREQUESTMESSAGE.fields_by_name['min_resources'].message_type = _RESOURCE
+_RESOURCEREQUESTMESSAGE.fields_by_name['attributes'].message_type = _ATTRIBUTE
 _RESOURCEOFFERMESSAGE.fields_by_name['offers'].message_type = _OFFER
 _OFFER.fields_by_name['resources'].message_type = _RESOURCE
 _OFFER.fields_by_name['attributes'].message_type = _ATTRIBUTE
+_JOURNALRECORD.fields_by_name['agent'].message_type = _AGENTINFO
+_JOURNALRECORD.fields_by_name['task'].message_type = _TASKINFO
+_JOURNALRECORD.fields_by_name['framework'].message_type = _FRAMEWORKINFO
+_JOURNALRECORD.oneofs_by_name['change'].fields.append(
+  _JOURNALRECORD.fields_by_name['agent'])
+_JOURNALRECORD.fields_by_name['agent'].containing_oneof = _JOURNALRECORD.oneofs_by_name['change']
+_JOURNALRECORD.oneofs_by_name['change'].fields.append(
+  _JOURNALRECORD.fields_by_name['task'])
+_JOURNALRECORD.fields_by_name['task'].containing_oneof = _JOURNALRECORD.oneofs_by_name['change']
+_JOURNALRECORD.oneofs_by_name['change'].fields.append(
+  _JOURNALRECORD.fields_by_name['framework'])
+_JOURNALRECORD.fields_by_name['framework'].containing_oneof = _JOURNALRECORD.oneofs_by_name['change']
+_JOURNALRECORD.oneofs_by_name['change'].fields.append(
+  _JOURNALRECORD.fields_by_name['removed_agent_id'])
+_JOURNALRECORD.fields_by_name['removed_agent_id'].containing_oneof = _JOURNALRECORD.oneofs_by_name['change']
+_JOURNALRECORD.oneofs_by_name['change'].fields.append(
+  _JOURNALRECORD.fields_by_name['removed_task_id'])
+_JOURNALRECORD.fields_by_name['removed_task_id'].containing_oneof = _JOURNALRECORD.oneofs_by_name['change']
+_JOURNALSNAPSHOT.fields_by_name['records'].message_type = _JOURNALRECORD
 DESCRIPTOR.message_types_by_name['WrapperMessage'] = _WRAPPERMESSAGE
 DESCRIPTOR.message_types_by_name['PingAgentMessage'] = _PINGAGENTMESSAGE
+DESCRIPTOR.message_types_by_name['TaskLog'] = _TASKLOG
 DESCRIPTOR.message_types_by_name['PongAgentMessage'] = _PONGAGENTMESSAGE
 DESCRIPTOR.message_types_by_name['AgentInfo'] = _AGENTINFO
 DESCRIPTOR.message_types_by_name['Resource'] = _RESOURCE
@@ -1320,6 +1654,8 @@ DESCRIPTOR.message_types_by_name['ResourceRequestMessage'] = _RESOURCEREQUESTMES
 DESCRIPTOR.message_types_by_name['ResourceOfferMessage'] = _RESOURCEOFFERMESSAGE
 DESCRIPTOR.message_types_by_name['Offer'] = _OFFER
 DESCRIPTOR.message_types_by_name['OfferID'] = _OFFERID
+DESCRIPTOR.message_types_by_name['JournalRecord'] = _JOURNALRECORD
+DESCRIPTOR.message_types_by_name['JournalSnapshot'] = _JOURNALSNAPSHOT
 _sym_db.RegisterFileDescriptor(DESCRIPTOR)
 
 WrapperMessage = _reflection.GeneratedProtocolMessageType('WrapperMessage', (_message.Message,), {
@@ -1336,6 +1672,13 @@ PingAgentMessage = _reflection.GeneratedProtocolMessageType('PingAgentMessage',
   })
 _sym_db.RegisterMessage(PingAgentMessage)
 
+TaskLog = _reflection.GeneratedProtocolMessageType('TaskLog', (_message.Message,), {
+  'DESCRIPTOR' : _TASKLOG,
+  '__module__' : 'messages_pb2'
+  # @@protoc_insertion_point(class_scope:TaskLog)
+  })
+_sym_db.RegisterMessage(TaskLog)
+
 PongAgentMessage = _reflection.GeneratedProtocolMessageType('PongAgentMessage', (_message.Message,), {
   'DESCRIPTOR' : _PONGAGENTMESSAGE,
   '__module__' : 'messages_pb2'
@@ -1499,5 +1842,19 @@ OfferID = _reflection.GeneratedProtocolMessageType('OfferID', (_message.Message,
   })
 _sym_db.RegisterMessage(OfferID)
 
+JournalRecord = _reflection.GeneratedProtocolMessageType('JournalRecord', (_message.Message,), {
+  'DESCRIPTOR' : _JOURNALRECORD,
+  '__module__' : 'messages_pb2'
+  # @@protoc_insertion_point(class_scope:JournalRecord)
+  })
+_sym_db.RegisterMessage(JournalRecord)
+
+JournalSnapshot = _reflection.GeneratedProtocolMessageType('JournalSnapshot', (_message.Message,), {
+  'DESCRIPTOR' : _JOURNALSNAPSHOT,
+  '__module__' : 'messages_pb2'
+  # @@protoc_insertion_point(class_scope:JournalSnapshot)
+  })
+_sym_db.RegisterMessage(JournalSnapshot)
+
 
 # @@protoc_insertion_point(module_scope)
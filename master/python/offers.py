@@ -0,0 +1,190 @@
+import threading
+import time
+
+import messages_pb2
+
+import allocator
+import db
+import liveness
+
+# Outstanding resource offers. An offer holds the resources it carries on
+# its agent (see allocator.py) until a task is launched against it, it is
+# rescinded (its agent expired or its framework asked for new offers) or
+# its TTL runs out. Frameworks asking at the same time are therefore
+# offered different resources instead of racing for the same agent, and
+# a task is only accepted if it fits an offer that is still outstanding.
+
+settings = {
+    'ttl_ms': 10000,
+    'require_offers': True,
+    'page_bytes': 1024,
+}
+
+#outstanding maps an offer_id to its Offer, offersByAgent and
+#offersByFramework map an agent_id/framework_id to its offer_ids
+outstanding = {}
+offersByAgent = {}
+offersByFramework = {}
+lock = threading.Lock()
+
+def configure(ttl_ms=None, require_offers=None, page_bytes=None):
+    if ttl_ms is not None:
+        settings['ttl_ms'] = ttl_ms
+    if require_offers is not None:
+        settings['require_offers'] = require_offers
+    if page_bytes is not None:
+        settings['page_bytes'] = page_bytes
+
+def make_offer(framework_id, agent, resources):
+    offer = messages_pb2.Offer()
+    offer.id = db.get_offer_id()
+    offer.framework_id = framework_id
+    offer.agent_id = agent.id
+    offer.resources.extend(resources)
+    offer.attributes.extend(agent.attributes)
+    with lock:
+        outstanding[offer.id] = offer
+        offersByAgent.setdefault(offer.agent_id, set()).add(offer.id)
+        offersByFramework.setdefault(framework_id, set()).add(offer.id)
+        allocator.hold(offer)
+    offer_timer.schedule(offer.id, time.time() * 1000 + settings['ttl_ms'])
+    return offer
+
+def _remove(offer_id):
+    offer = outstanding.pop(offer_id, None)
+    if offer is None:
+        return None
+    for index, key in ((offersByAgent, offer.agent_id), (offersByFramework, offer.framework_id)):
+        index[key].discard(offer_id)
+        if not index[key]:
+            del index[key]
+    offer_timer.cancel(offer_id)
+    return offer
+
+def rescind(offer_id):
+    with lock:
+        offer = _remove(offer_id)
+        if offer is not None:
+            allocator.unhold(offer_id)
+    return offer
+
+def _expire(offer_id):
+    if rescind(offer_id) is not None:
+        print("Offer " + offer_id + " expired")
+
+def rescind_agent(agent_id):
+    with lock:
+        offer_ids = list(offersByAgent.get(agent_id, ()))
+    for offer_id in offer_ids:
+        rescind(offer_id)
+
+def rescind_framework(framework_id):
+    with lock:
+        offer_ids = list(offersByFramework.get(framework_id, ()))
+        for cursor, pager in list(pagers.items()):
+            if pager.framework_id == framework_id:
+                del pagers[cursor]
+    for offer_id in offer_ids:
+        rescind(offer_id)
+
+db.agent_expiry_hooks.append(rescind_agent)
+
+# Offer responses are paged so each fits about page_bytes (by default a
+# single CoAP block). An OfferPager turns the allocator's (agent,
+# resources) generator into offers only as pages are asked for, and is
+# parked under its cursor between requests for up to the offer TTL.
+
+#pagers maps a cursor to the OfferPager that continues it
+pagers = {}
+
+class OfferPager:
+    def __init__(self, framework_id, allocation):
+        self.cursor = db.get_offer_id()
+        self.framework_id = framework_id
+        self.allocation = allocation
+        self.pending = None
+        self.done = False
+        self.expires = 0
+
+    def fill(self, offermsg, page_bytes):
+        # adds offers until the next one would take the message over
+        # page_bytes, always at least one. Leaves room for next_cursor.
+        used = offermsg.ByteSize() + 2 + len(self.cursor) + 4
+        while True:
+            offer = self.pending
+            self.pending = None
+            if offer is None:
+                try:
+                    agent, resources = next(self.allocation)
+                except StopIteration:
+                    self.done = True
+                    return
+                offer = make_offer(self.framework_id, agent, resources)
+            elif offer.id not in outstanding:
+                #expired or rescinded while parked
+                continue
+            size = offer.ByteSize()
+            size += 1 + db._varint_len(size)
+            if len(offermsg.offers) and used + size > page_bytes:
+                self.pending = offer
+                return
+            offermsg.offers.add().CopyFrom(offer)
+            used += size
+
+def park(pager):
+    now = time.time() * 1000
+    pager.expires = now + settings['ttl_ms']
+    with lock:
+        for cursor, parked in list(pagers.items()):
+            if parked.expires < now:
+                del pagers[cursor]
+        pagers[pager.cursor] = pager
+    return pager.cursor
+
+def resume(cursor, framework_id):
+    # the pager parked under cursor, or None if it is gone
+    with lock:
+        pager = pagers.pop(cursor, None)
+    if pager is None or pager.framework_id != framework_id \
+            or pager.expires < time.time() * 1000:
+        return None
+    return pager
+
+offer_timer = liveness.TimerWheel(_expire)
+
+def claim(run_task):
+    # takes the offer a task is launched against off the outstanding
+    # offers and returns None, or an error if the task doesn't fit it.
+    # The offer's resources stay held until release() so they can't be
+    # offered again before the task's own reservation is in place.
+    task = run_task.task
+    offer_id = run_task.offer_id
+    if not offer_id:
+        if settings['require_offers']:
+            return "task " + task.task_id + " was not launched against an offer"
+        return None
+    with lock:
+        offer = outstanding.get(offer_id)
+        if offer is None:
+            return "offer " + offer_id + " is unknown, expired or rescinded"
+        if offer.framework_id != task.framework.framework_id:
+            return "offer " + offer_id + " was made to another framework"
+        if offer.agent_id != task.agent_id:
+            return "offer " + offer_id + " is for agent " + offer.agent_id
+        offered = allocator.scalars(offer)
+        for name, amount in allocator.scalars(task).items():
+            if amount > offered.get(name, 0) + 0.0005:
+                return "task " + task.task_id + " asks for more " + name + " than offer " + offer_id + " holds"
+        _remove(offer_id)
+    return None
+
+def release(run_task):
+    # frees the resources of a claimed offer once the task holds its own
+    if run_task.offer_id:
+        allocator.unhold(run_task.offer_id)
+
+def start_expiry():
+    offer_timer.start()
+
+def expire_offers():
+    offer_timer.advance()
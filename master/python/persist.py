@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+import time
+
+import messages_pb2
+
+import db
+
+# Write-behind persistence of the master state to SQLite.
+#
+# db.change_listeners queue each changed agent, task and framework (the
+# newest version of a row replaces any queued one) and a writer thread
+# commits everything queued in one transaction every commit_interval_ms,
+# so pings never wait on the disk. The database runs in WAL mode with
+# synchronous=NORMAL: a crash loses at most the last interval of changes.
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS agent_info (id TEXT PRIMARY KEY, data BLOB)",
+    "CREATE TABLE IF NOT EXISTS task_info (id TEXT PRIMARY KEY, submitted REAL, data BLOB)",
+    "CREATE INDEX IF NOT EXISTS task_info_submitted ON task_info (submitted)",
+    "CREATE TABLE IF NOT EXISTS framework_info (id TEXT PRIMARY KEY, data BLOB)",
+]
+
+TABLES = {
+    'agent': 'agent_info',
+    'task': 'task_info',
+    'framework': 'framework_info',
+}
+
+def _parse(message_type, data):
+    message = message_type()
+    message.ParseFromString(data)
+    return message
+
+class StateStore:
+    def __init__(self, path, commit_interval_ms=100):
+        self.path = path
+        self.commit_interval_ms = commit_interval_ms
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.commit_lock = threading.Lock()
+        self.writer = None
+
+    def load(self):
+        # returns the saved agents, (task, submitted) pairs in submission
+        # order and frameworks
+        agents = [_parse(messages_pb2.AgentInfo, data)
+                  for data, in self.conn.execute("SELECT data FROM agent_info")]
+        tasks = [(_parse(messages_pb2.TaskInfo, data), submitted)
+                 for data, submitted in self.conn.execute("SELECT data, submitted FROM task_info ORDER BY submitted, rowid")]
+        frameworks = [_parse(messages_pb2.FrameworkInfo, data)
+                      for data, in self.conn.execute("SELECT data FROM framework_info")]
+        return agents, tasks, frameworks
+
+    def on_change(self, table, key, message):
+        # serialize now, the message may change again before the commit
+        if message is None:
+            row = None
+        elif table == 'task':
+            row = (db.task_submit_time(key), message.SerializeToString())
+        else:
+            row = (message.SerializeToString(),)
+        with self.pending_lock:
+            self.pending[(table, key)] = row
+
+    def commit(self):
+        # holding commit_lock across the swap keeps batches in order
+        with self.commit_lock:
+            with self.pending_lock:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return 0
+            with self.conn:
+                for (table, key), row in pending.items():
+                    if row is None:
+                        self.conn.execute("DELETE FROM " + TABLES[table] + " WHERE id = ?", (key,))
+                    elif table == 'task':
+                        self.conn.execute("INSERT OR REPLACE INTO task_info (id, submitted, data) VALUES (?, ?, ?)",
+                                          (key,) + row)
+                    else:
+                        self.conn.execute("INSERT OR REPLACE INTO " + TABLES[table] + " (id, data) VALUES (?, ?)",
+                                          (key,) + row)
+            return len(pending)
+
+    def _write(self):
+        while True:
+            time.sleep(self.commit_interval_ms / 1000)
+            try:
+                self.commit()
+            except Exception as e:
+                print("Persistence error: " + str(e))
+
+    def start(self):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write, name="persist", daemon=True)
+            self.writer.start()
+
+    def close(self):
+        self.commit()
+        with self.commit_lock:
+            self.conn.close()
+
+def open_store(path, commit_interval_ms=100):
+    # restore the saved state into db and persist every change from now on
+    store = StateStore(path, commit_interval_ms)
+    started = time.time()
+    agents, tasks, frameworks = store.load()
+    db.restore(agents, tasks, frameworks)
+    print("Restored " + str(len(agents)) + " agent(s), " + str(len(tasks)) + " task(s) and "
+          + str(len(frameworks)) + " framework(s) from " + path
+          + " in " + str(round((time.time() - started) * 1000)) + "ms")
+    db.change_listeners.append(store.on_change)
+    store.start()
+    return store
@@ -0,0 +1,185 @@
+import queue
+import socket
+import threading
+import time
+
+import messages_pb2
+
+import db
+import journal
+
+# Hot-standby replication of the master state.
+#
+# The leader serves its state change stream over TCP: a standby that
+# connects is sent a JournalSnapshot of the current state and then every
+# JournalRecord as it happens (see journal.py for the framing), with an
+# empty record as a heartbeat whenever the stream is idle. The standby
+# applies all of it to its own db. Once it has heard nothing from the
+# leader for failover_timeout_ms it returns from follow() and the caller
+# starts serving, taking over the leader's CoAP port. Agent ping seqs are
+# replicated as well, so agents keep sending delta pings to the new
+# leader instead of a full resync.
+#
+# Taking over the leader's address only works when both run on the same
+# host (or behind an address that moves with the leader).
+
+class ReplicationServer:
+    def __init__(self, host, port, heartbeat_ms=500, max_backlog=100000):
+        self.host = host
+        self.port = int(port)
+        self.heartbeat_ms = heartbeat_ms
+        self.max_backlog = max_backlog
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.standbys = []
+
+    def on_change(self, table, key, message):
+        if not self.standbys:
+            return
+        record = journal.record_for(table, key, message)
+        with self.lock:
+            self.seq += 1
+            record.seq = self.seq
+            data = record.SerializeToString()
+            for standby in list(self.standbys):
+                if standby.qsize() > self.max_backlog:
+                    #too far behind, it reconnects and starts from a snapshot
+                    print("Dropping standby that fell behind")
+                    self.standbys.remove(standby)
+                    standby.put(None)
+                else:
+                    standby.put(data)
+
+    def _send(self, out, data):
+        out.write(journal.LENGTH.pack(len(data)))
+        out.write(data)
+
+    def _serve_standby(self, conn, addr):
+        print("Standby connected from " + str(addr))
+        standby = queue.Queue()
+        with self.lock:
+            self.standbys.append(standby)
+            seq = self.seq
+        try:
+            out = conn.makefile("wb")
+            # read the state only after registering so no change is missed
+            self._send(out, journal.build_snapshot(seq).SerializeToString())
+            out.flush()
+            while True:
+                try:
+                    data = standby.get(timeout=self.heartbeat_ms / 1000)
+                except queue.Empty:
+                    heartbeat = messages_pb2.JournalRecord()
+                    heartbeat.seq = self.seq
+                    data = heartbeat.SerializeToString()
+                if data is None:
+                    break
+                self._send(out, data)
+                if standby.empty():
+                    out.flush()
+        except OSError as e:
+            print("Standby " + str(addr) + " disconnected: " + str(e))
+        finally:
+            with self.lock:
+                if standby in self.standbys:
+                    self.standbys.remove(standby)
+            conn.close()
+
+    def _accept(self, server):
+        while True:
+            conn, addr = server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve_standby, args=(conn, addr), daemon=True).start()
+
+    def start(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, self.port))
+        server.listen(4)
+        db.change_listeners.append(self.on_change)
+        threading.Thread(target=self._accept, args=(server,), name="replication", daemon=True).start()
+        print("Replication server start on " + self.host + ":" + str(self.port))
+
+def _apply_snapshot(snapshot):
+    agents = []
+    agent_seqs = {}
+    tasks = []
+    frameworks = []
+    for record in snapshot.records:
+        change = record.WhichOneof('change')
+        if change == 'agent':
+            agents.append(record.agent)
+            if record.HasField('ack_seq'):
+                agent_seqs[record.agent.id] = record.ack_seq
+        elif change == 'task':
+            tasks.append((record.task, record.submitted))
+        elif change == 'framework':
+            frameworks.append(record.framework)
+
+    # anything the leader no longer has is gone
+    agent_ids = set([agent.id for agent in agents])
+    for agent_id in list(db.agents):
+        if agent_id not in agent_ids:
+            db.forget_agent(agent_id)
+    task_ids = set([task.task_id for task, submitted in tasks])
+    for task in db.get_all_tasks():
+        if task.task_id not in task_ids:
+            db.forget_task(task.task_id)
+
+    db.restore(agents, tasks, frameworks, agent_seqs)
+
+def _apply_record(record):
+    change = record.WhichOneof('change')
+    if change == 'agent':
+        agent_seqs = {}
+        if record.HasField('ack_seq'):
+            agent_seqs[record.agent.id] = record.ack_seq
+        db.restore([record.agent], [], [], agent_seqs)
+    elif change == 'task':
+        db.restore([], [(record.task, record.submitted)], [])
+    elif change == 'framework':
+        db.restore([], [], [record.framework])
+    elif change == 'removed_agent_id':
+        db.forget_agent(record.removed_agent_id)
+    elif change == 'removed_task_id':
+        db.forget_task(record.removed_task_id)
+
+class Standby:
+    def __init__(self, leader_host, leader_port, failover_timeout_ms=3000):
+        self.leader_host = leader_host
+        self.leader_port = int(leader_port)
+        self.failover_timeout_ms = failover_timeout_ms
+        self.last_contact = time.time()
+
+    def _stream(self, conn):
+        frames = journal.read_frames(conn.makefile("rb"))
+        for data in frames:
+            self.last_contact = time.time()
+            snapshot = messages_pb2.JournalSnapshot()
+            snapshot.ParseFromString(data)
+            _apply_snapshot(snapshot)
+            print("Loaded leader snapshot at seq " + str(snapshot.seq))
+            break
+        for data in frames:
+            self.last_contact = time.time()
+            record = messages_pb2.JournalRecord()
+            record.ParseFromString(data)
+            _apply_record(record)
+
+    def follow(self):
+        # returns once the leader has been unreachable for failover_timeout_ms
+        timeout = self.failover_timeout_ms / 1000
+        while True:
+            try:
+                conn = socket.create_connection((self.leader_host, self.leader_port), timeout=timeout)
+                print("Following leader " + self.leader_host + ":" + str(self.leader_port))
+                try:
+                    self._stream(conn)
+                finally:
+                    conn.close()
+            except OSError as e:
+                print("Lost leader: " + str(e))
+            if time.time() - self.last_contact > timeout:
+                print("Leader gone for " + str(self.failover_timeout_ms) + "ms, taking over")
+                return
+            time.sleep(min(timeout, 0.5))
@@ -0,0 +1,111 @@
+import threading
+
+import numpy as np
+
+import messages_pb2
+
+import db
+
+# The scalar resources of every agent as NumPy matrices (agents x
+# resource names), so offer requests filter and rank agents with array
+# operations instead of walking Resource protobufs agent by agent.
+#
+# reported is updated from each ping through db.change_listeners and
+# reserved by the allocation ledger. Rows are reused once an agent is
+# gone and nothing is reserved on it; columns are added for new resource
+# names as agents report them.
+
+class ResourceMatrix:
+    def __init__(self, capacity=64):
+        self.lock = threading.Lock()
+        self.columns = {}
+        self.rows = {}
+        self.free_rows = list(range(capacity - 1, -1, -1))
+        self.agent_ids = np.empty(capacity, dtype=object)
+        self.live = np.zeros(capacity, dtype=bool)
+        self.reported = np.zeros((capacity, 0))
+        self.reserved = np.zeros((capacity, 0))
+
+    def _column(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            column = len(self.columns)
+            self.columns[name] = column
+            grow = np.zeros((len(self.live), 1))
+            self.reported = np.hstack((self.reported, grow))
+            self.reserved = np.hstack((self.reserved, grow))
+        return column
+
+    def _row(self, agent_id):
+        row = self.rows.get(agent_id)
+        if row is not None:
+            return row
+        if not self.free_rows:
+            capacity = len(self.live)
+            self.free_rows = list(range(capacity * 2 - 1, capacity - 1, -1))
+            self.agent_ids = np.concatenate((self.agent_ids, np.empty(capacity, dtype=object)))
+            self.live = np.concatenate((self.live, np.zeros(capacity, dtype=bool)))
+            self.reported = np.vstack((self.reported, np.zeros(self.reported.shape)))
+            self.reserved = np.vstack((self.reserved, np.zeros(self.reserved.shape)))
+        row = self.free_rows.pop()
+        self.rows[agent_id] = row
+        self.agent_ids[row] = agent_id
+        return row
+
+    def _release_row(self, agent_id, row):
+        if not self.live[row] and not self.reserved[row].any():
+            del self.rows[agent_id]
+            self.agent_ids[row] = None
+            self.free_rows.append(row)
+
+    def on_change(self, table, key, message):
+        if table != 'agent':
+            return
+        with self.lock:
+            if message is None:
+                row = self.rows.get(key)
+                if row is not None:
+                    self.live[row] = False
+                    self.reported[row] = 0
+                    self._release_row(key, row)
+                return
+            row = self._row(key)
+            values = {}
+            for resource in message.resources:
+                if resource.type == messages_pb2.Value.SCALAR:
+                    values[resource.name] = values.get(resource.name, 0) + resource.scalar.value
+            for name in values:
+                self._column(name)
+            self.reported[row] = 0
+            for name, value in values.items():
+                self.reported[row, self.columns[name]] = value
+            self.live[row] = True
+
+    def set_reserved(self, agent_id, amounts):
+        with self.lock:
+            if not amounts and agent_id not in self.rows:
+                return
+            for name in amounts:
+                self._column(name)
+            row = self._row(agent_id)
+            self.reserved[row] = 0
+            for name, amount in amounts.items():
+                self.reserved[row, self.columns[name]] = amount
+            self._release_row(agent_id, row)
+
+    def totals(self):
+        # {name: sum over live agents of what they report}
+        with self.lock:
+            sums = self.reported[self.live].sum(axis=0)
+            return dict([(name, sums[column]) for name, column in self.columns.items()])
+
+    def snapshot(self):
+        # (agent_ids, {name: column}, available) for every live agent, where
+        # available is what they report less what is reserved on them
+        with self.lock:
+            live = self.live.nonzero()[0]
+            available = np.maximum(self.reported[live] - self.reserved[live], 0)
+            return self.agent_ids[live], dict(self.columns), available
+
+matrix = ResourceMatrix()
+db.change_listeners.append(matrix.on_change)
@@ -0,0 +1 @@
+python3 master_async.py --host 127.0.0.1 --port 3000
\ No newline at end of file
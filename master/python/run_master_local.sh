@@ -1 +1 @@
-python3 master.py --host 127.0.0.1 --port 3000
\ No newline at end of file
+python3 master.py --host 127.0.0.1 --port 3000 --replication-port 3001
\ No newline at end of file
@@ -0,0 +1 @@
+python3 master.py --host 127.0.0.1 --port 3000 --replication-port 3001 --standby-of 127.0.0.1:3001
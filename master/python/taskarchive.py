@@ -0,0 +1,67 @@
+import struct
+import threading
+
+import messages_pb2
+
+# Append-only file of full TaskInfo records for tasks the master no
+# longer keeps in memory. Each record is a 4 byte big-endian length and
+# the 8 byte time (ms) the task finished, followed by the serialized
+# TaskInfo; a record's offset is its address.
+
+HEADER = struct.Struct(">Id")
+
+class TaskArchive:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.writer = open(path, "ab")
+        self.reader = open(path, "rb")
+
+    def append(self, task, finished):
+        data = task.SerializeToString()
+        with self.lock:
+            offset = self.writer.tell()
+            self.writer.write(HEADER.pack(len(data), finished))
+            self.writer.write(data)
+        return offset
+
+    def scan(self):
+        # yields (offset, finished, task) for every record, oldest first.
+        # A record cut short by a crash is dropped so appends start clean.
+        with self.lock:
+            self.writer.flush()
+            self.reader.seek(0)
+            while True:
+                offset = self.reader.tell()
+                header = self.reader.read(HEADER.size)
+                if not header:
+                    return
+                data = b""
+                if len(header) == HEADER.size:
+                    length, finished = HEADER.unpack(header)
+                    data = self.reader.read(length)
+                if len(header) < HEADER.size or len(data) < length:
+                    self.writer.truncate(offset)
+                    return
+                task = messages_pb2.TaskInfo()
+                task.ParseFromString(data)
+                yield offset, finished, task
+
+    def flush(self):
+        with self.lock:
+            self.writer.flush()
+
+    def read(self, offset):
+        with self.lock:
+            self.writer.flush()
+            self.reader.seek(offset)
+            length, finished = HEADER.unpack(self.reader.read(HEADER.size))
+            data = self.reader.read(length)
+        task = messages_pb2.TaskInfo()
+        task.ParseFromString(data)
+        return task
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+            self.reader.close()
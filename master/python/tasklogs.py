@@ -0,0 +1,52 @@
+import collections
+import threading
+
+# Task logs fetched from agents. Agents only report a digest and size of
+# the log they captured when a task's container exited; GET
+# /tasks/<task_id>/logs asks the task's agent for the log in its next
+# pong and serves it from here once a ping brought it. An agent that no
+# longer has a log answers with an empty one (no digest), which is kept
+# as the log being gone. Only the last max_logs answers are kept.
+
+settings = {
+    'max_logs': 64,
+}
+
+#logs maps a task_id to its (digest, log), requested maps an agent_id
+#to the task_ids to ask it for
+logs = collections.OrderedDict()
+requested = {}
+lock = threading.Lock()
+
+def configure(max_logs=None):
+    if max_logs is not None:
+        settings['max_logs'] = max_logs
+
+def request(agent_id, task_id):
+    with lock:
+        requested.setdefault(agent_id, set()).add(task_id)
+
+def take_requests(agent_id):
+    with lock:
+        return sorted(requested.pop(agent_id, ()))
+
+def store(task_log):
+    with lock:
+        logs[task_log.task_id] = (task_log.digest, task_log.data)
+        logs.move_to_end(task_log.task_id)
+        while len(logs) > settings['max_logs']:
+            logs.popitem(last=False)
+
+def gone(task_id):
+    # whether the task's agent answered that it no longer has its log
+    with lock:
+        log = logs.get(task_id)
+    return log is not None and not log[0]
+
+def get(task_id, digest):
+    # the log if we have the one with this digest, otherwise None
+    with lock:
+        log = logs.get(task_id)
+    if log is None or log[0] != digest:
+        return None
+    return log[1]
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import messages_pb2
+
+import db
+
+# Drives the ping path (agents pinging, reporting task states and taking
+# their queued tasks) concurrently with REST readers, the agent reaper and
+# task compaction, then checks that nothing raised and that the task
+# indexes still agree with the task table.
+
+NUM_AGENTS = 8
+TASKS_PER_AGENT = 200
+DURATION = 3
+
+def make_agent(agent_id):
+    agent = messages_pb2.AgentInfo()
+    agent.ping_rate = 50
+    resource = agent.resources.add()
+    resource.name = "cpus"
+    resource.type = messages_pb2.Value.SCALAR
+    resource.scalar.value = 4
+    return agent
+
+def make_run_task(agent_id, n):
+    run_task = messages_pb2.RunTaskMessage()
+    task = run_task.task
+    task.name = "stress"
+    task.task_id = agent_id + "-" + str(n)
+    task.agent_id = agent_id
+    task.framework.name = "stress"
+    task.framework.framework_id = "stress"
+    task.container.type = messages_pb2.ContainerInfo.Type.DOCKER
+    return run_task
+
+class DbConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        db.configure_retention(max_age_ms=10, max_count=50, archived_index_size=1000)
+        self.errors = []
+        self.stop = threading.Event()
+
+    def run_until_stopped(self, target, *args):
+        def loop():
+            try:
+                while not self.stop.is_set():
+                    target(*args)
+            except Exception as e:
+                self.errors.append(e)
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def ping(self, agent_id, counter):
+        db.refresh_agent(agent_id, make_agent(agent_id))
+        n = counter[0]
+        counter[0] += 1
+        if n < TASKS_PER_AGENT:
+            db.add_task(make_run_task(agent_id, n))
+        reports = []
+        for task in db.get_next_unissued_tasks_by_agent(agent_id, 4, 1024):
+            report = messages_pb2.TaskInfo()
+            report.CopyFrom(task)
+            report.state = messages_pb2.TaskInfo.TaskState.RUNNING if n % 2 \
+                else messages_pb2.TaskInfo.TaskState.COMPLETED
+            reports.append(report)
+        db.refresh_tasks(reports)
+        #let some agents go quiet long enough to be reaped
+        if n % 50 == 49:
+            time.sleep(0.2)
+
+    def read_api(self):
+        db.get_agents_json()
+        db.get_tasks_json()
+        db.query_agents(limit=5)
+        db.query_tasks(states=set([messages_pb2.TaskInfo.TaskState.RUNNING]), limit=20)
+        db.query_tasks(agent_id="agent-1", cursor=10, limit=20)
+
+    def test_ping_path_against_readers_reaper_and_compaction(self):
+        threads = []
+        for i in range(NUM_AGENTS):
+            threads.append(self.run_until_stopped(self.ping, "agent-" + str(i), [0]))
+        for i in range(2):
+            threads.append(self.run_until_stopped(self.read_api))
+        threads.append(self.run_until_stopped(db.clear_stale_agents))
+        threads.append(self.run_until_stopped(db.compact_tasks))
+
+        time.sleep(DURATION)
+        self.stop.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.errors, [])
+        with db.tasks_lock:
+            indexed = set()
+            for state, task_ids in db.tasksByState.items():
+                for task_id in task_ids:
+                    self.assertIn(task_id, db.tasks)
+                    self.assertEqual(db.tasks[task_id].state, state)
+                indexed |= task_ids
+            self.assertEqual(indexed, set([task_id for task_id, task in db.tasks.items()
+                                           if task.HasField('state')]))
+            #the seq indexes list the same tasks, in seq order
+            for state, task_ids in db.tasksByState.items():
+                seqs = db.stateSeqs.seqs.get(state, [])
+                self.assertEqual(seqs, sorted([db.taskSeqs[task_id] for task_id in task_ids]))
+            for agent_id, task_ids in db.tasksByAgent.items():
+                seqs = db.agentSeqs.seqs.get(agent_id, [])
+                self.assertEqual(seqs, sorted([db.taskSeqs[task_id] for task_id in task_ids]))
+        self.assertTrue(db.archivedTasks)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,14 +16,16 @@ import messages_pb2
 client = None
 framework_name = "Test Framework Name"
 framework_id = "TEST ID"
+framework_role = None
+# keep each offer response to one CoAP block
+page_bytes = 1024
 
 def submitDummyTask(offers):
     print("Searching for a good offer...")
-    slave_to_use = None
+    offer_to_use = None
     resources_to_use = {}
-    for i in reversed(range(len(offers))):
-        offer = offers[i]
-        if offer.slave_id:
+    for offer in offers:
+        if offer.agent_id:
             resources_to_use = {}
             for resource in offer.resources:
                 if resource.name == "cpus" and resource.scalar.value >= 1:
@@ -31,21 +33,24 @@ def submitDummyTask(offers):
                 if resource.name == "mem" and resource.scalar.value > 100000000:
                     resources_to_use["mem"] = 100000000
             if len(resources_to_use) == 2:
-                slave_to_use = offer.slave_id
-            break
-    if not slave_to_use:
+                offer_to_use = offer
+                break
+    if not offer_to_use:
         print("No available agents...")
         return
 
-    print("Submitting task to agent " + slave_to_use + "...")
+    print("Submitting task to agent " + offer_to_use.agent_id + "...")
 
     # construct message
     wrapper = messages_pb2.WrapperMessage()
     wrapper.run_task.task.framework.name = framework_name
     wrapper.run_task.task.framework.framework_id = framework_id
+    if framework_role:
+        wrapper.run_task.task.framework.role = framework_role
     wrapper.run_task.task.name = "test task"
     wrapper.run_task.task.task_id = str(uuid.uuid1())
-    wrapper.run_task.task.slave_id = slave_to_use
+    wrapper.run_task.task.agent_id = offer_to_use.agent_id
+    wrapper.run_task.offer_id = offer_to_use.id
     for resource in resources_to_use:
         r = wrapper.run_task.task.resources.add()
         r.name = resource
@@ -61,7 +66,9 @@ def submitDummyTask(offers):
     runtask_payload = wrapper.SerializeToString()
     ct = {'content_type': defines.Content_types["application/octet-stream"]}
     response = client.post('task', runtask_payload, timeout=2, **ct)
-    if response:
+    if response and response.code == defines.Codes.FORBIDDEN.number:
+        print("Task rejected: " + str(response.payload))
+    elif response:
         wrapper = messages_pb2.WrapperMessage()
         wrapper.ParseFromString(response.payload)
         print("Task Running!")
@@ -72,20 +79,35 @@ def submitDummyTask(offers):
         client.stop()
         sys.exit(1)
 
-def getOffer():
-    # get offers
+def getOffer(cursor=None):
+    # yields offers page by page, only asking for the next page once the
+    # previous one has been used up
     print("Requesting resource offers...")
     wrapper = messages_pb2.WrapperMessage()
     wrapper.request.framework_id = framework_id
+    if framework_role:
+        wrapper.request.role = framework_role
+    # only ask for agents that can fit the dummy task
+    for name, value in (("cpus", 1), ("mem", 100000001)):
+        r = wrapper.request.min_resources.add()
+        r.name = name
+        r.type = messages_pb2.Value.SCALAR
+        r.scalar.value = value
+    wrapper.request.max_offers = 1
+    wrapper.request.page_bytes = page_bytes
+    if cursor:
+        wrapper.request.cursor = cursor
     request_payload = wrapper.SerializeToString()
     ct = {'content_type': defines.Content_types["application/octet-stream"]}
     response = client.post('request', request_payload, timeout=2, **ct)
     if response:
         wrapper = messages_pb2.WrapperMessage()
         wrapper.ParseFromString(response.payload)
-        offers = wrapper.offermsg.offers
         print("Got offers!")
-        return offers
+        for offer in wrapper.offermsg.offers:
+            yield offer
+        if wrapper.offermsg.next_cursor:
+            yield from getOffer(wrapper.offermsg.next_cursor)
     else:
         print("Couldn't receive resource offer... ?")
         client.stop()
@@ -131,5 +153,7 @@ if __name__ == '__main__':  # pragma: no cover
     parser = argparse.ArgumentParser(description='Launch a CoAP Resource Manager Framework')
     parser.add_argument('--host', required=True, help='the Edge RM Master IP to register with.')
     parser.add_argument('--port', required=False, default=5683, help='the Edge RM Master port to register on.')
+    parser.add_argument('--role', required=False, default=None, help='the role the framework is allocated resources under.')
     args = parser.parse_args()
+    framework_role = args.role
     main(args.host, args.port)